@@ -0,0 +1,325 @@
+"""Load test: concurrent traffic mixes against the API with seeded data.
+
+Seeds a throwaway database with users, sessions and valentines, starts the
+app in-process (or targets a running server with --base-url) and drives each
+traffic mix with concurrent async clients for a fixed duration:
+
+    receiver_burst  many receivers opening a small set of hot links
+    dashboard       creators loading /auth/me, their valentine list and stats
+    response        receivers clicking yes/no
+    checkout        pricing, valentine creation and Razorpay order creation
+
+Throughput and p50/p95/p99 latency are reported per endpoint and saved as
+JSON (with the commit they ran against), so runs can be diffed:
+
+    python benchmarks/load.py --valentines 100000
+    python benchmarks/load.py --valentines 1000000 --baseline benchmarks/results/<earlier>.json
+
+The Mongo URL defaults to $MONGO_URL or a local mongod. In-process runs stub
+Razorpay with a fixed delay and leave the email outbox undrained, so nothing
+leaves the machine. Seeded data is reused by later runs with the same shape;
+pass --drop to remove the database afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(BACKEND_DIR))
+
+TEMPLATES = ["runaway_no", "emotional_damage", "guilt_trip", "puppy_eyes", "destiny_mode"]
+TIMEZONES = ["Asia/Kolkata", "America/New_York", "Europe/London", "Asia/Dhaka", "UTC"]
+DASHBOARD_FIELDS = "valentine_id,to_name,from_name,message,template_id,payment_status,response,view_count"
+SEED_BATCH = 10000
+
+# Seeding
+def user_id(i):
+    return f"user_bench{i:07d}"
+
+def session_token(i):
+    return f"bench_session_{i:07d}"
+
+def valentine_id(i):
+    return f"val_bench{i:08d}"
+
+async def seed(db, users, valentines, rng):
+    """Insert users, one session each and valentines spread over 30 days"""
+    now = datetime.now(timezone.utc)
+    meta = await db.bench_meta.find_one({"_id": "seed"})
+    if meta and meta["users"] == users and meta["valentines"] == valentines:
+        print(f"reusing seeded data: {users} users, {valentines} valentines")
+        return
+    for name in ("users", "user_sessions", "valentines", "user_stats", "bench_meta"):
+        await db[name].drop()
+
+    started = time.perf_counter()
+    for start in range(0, users, SEED_BATCH):
+        batch = range(start, min(start + SEED_BATCH, users))
+        await db.users.insert_many([
+            {"user_id": user_id(i), "email": f"bench{i}@example.com", "name": f"Bench User {i}",
+             "picture": None, "created_at": now - timedelta(days=60)}
+            for i in batch
+        ], ordered=False)
+        await db.user_sessions.insert_many([
+            {"user_id": user_id(i), "session_token": session_token(i),
+             "expires_at": now + timedelta(days=7), "created_at": now}
+            for i in batch
+        ], ordered=False)
+
+    for start in range(0, valentines, SEED_BATCH):
+        docs = []
+        for i in range(start, min(start + SEED_BATCH, valentines)):
+            paid = rng.random() < 0.7
+            response = rng.choice(["yes", "yes", "yes", "no"]) if paid and rng.random() < 0.5 else None
+            created_at = now - timedelta(seconds=rng.randrange(30 * 24 * 3600))
+            docs.append({
+                "valentine_id": valentine_id(i),
+                "user_id": user_id(i % users),
+                "template_id": rng.choice(TEMPLATES),
+                "from_name": f"Sender {i}",
+                "to_name": f"Receiver {i}",
+                "message": "I've been wanting to ask you this for so long... Will you be my Valentine? 💕",
+                "emoji_style": "cute",
+                "background_theme": "pink",
+                "unique_link": valentine_id(i),
+                "payment_status": "completed" if paid else "pending",
+                "payment_id": f"pay_bench{i:08d}" if paid else None,
+                "response": response,
+                "response_at": created_at + timedelta(hours=2) if response else None,
+                "created_at": created_at,
+            })
+        await db.valentines.insert_many(docs, ordered=False)
+        print(f"  seeded {start + len(docs)}/{valentines} valentines", end="\r")
+
+    await db.bench_meta.insert_one({"_id": "seed", "users": users, "valentines": valentines})
+    print(f"seeded {users} users and {valentines} valentines in {time.perf_counter() - started:.1f}s")
+
+# Traffic mixes: each returns (endpoint label, method, path, request kwargs, accepted statuses)
+def skewed(rng, count, hot_share=0.01):
+    """Pick an index where a small hot set gets most of the traffic"""
+    return int(count * hot_share * rng.random()) if rng.random() < 0.8 else rng.randrange(count)
+
+def receiver_burst(ctx, rng):
+    i = skewed(rng, ctx.valentines)
+    return ("GET /api/valentines/{valentine_id}", "GET", f"/api/valentines/{valentine_id(i)}", {}, {200, 304})
+
+def dashboard(ctx, rng):
+    cookies = {"session_token": session_token(rng.randrange(ctx.users))}
+    kind = rng.random()
+    if kind < 0.3:
+        return ("GET /api/auth/me", "GET", "/api/auth/me", {"cookies": cookies}, {200})
+    if kind < 0.8:
+        return ("GET /api/valentines", "GET", "/api/valentines",
+                {"cookies": cookies, "params": {"fields": DASHBOARD_FIELDS}}, {200})
+    return ("GET /api/valentines/stats", "GET", "/api/valentines/stats", {"cookies": cookies}, {200})
+
+def response_clicks(ctx, rng):
+    i = rng.randrange(ctx.valentines)
+    return ("POST /api/valentines/{valentine_id}/response", "POST", f"/api/valentines/{valentine_id(i)}/response",
+            {"json": {"response": rng.choice(["yes", "no"])}}, {200, 409})
+
+def checkout(ctx, rng):
+    user = rng.randrange(ctx.users)
+    kind = rng.random()
+    if kind < 0.4:
+        return ("POST /api/payment/pricing", "POST", "/api/payment/pricing",
+                {"json": {"timezone": rng.choice(TIMEZONES)}}, {200})
+    if kind < 0.7:
+        return ("POST /api/valentines", "POST", "/api/valentines", {
+            "cookies": {"session_token": session_token(user)},
+            "headers": {"Idempotency-Key": f"bench-{rng.getrandbits(64):016x}"},
+            "json": {"template_id": rng.choice(TEMPLATES), "from_name": "Bench", "to_name": "Load",
+                     "message": "Load test valentine 💕", "emoji_style": "cute", "background_theme": "pink"},
+        }, {200})
+    if not ctx.stub_razorpay:
+        # Never create real orders against a live provider
+        return ("POST /api/payment/pricing", "POST", "/api/payment/pricing", {"json": {"timezone": "UTC"}}, {200})
+    return ("POST /api/payment/create-order", "POST", "/api/payment/create-order", {
+        "headers": {"Idempotency-Key": f"bench-{rng.getrandbits(64):016x}"},
+        "json": {"valentine_id": valentine_id(rng.randrange(ctx.valentines)), "amount": 999, "currency": "INR",
+                 "bundle_type": rng.choice(["single", "bundle_3", "bundle_5"]), "timezone": rng.choice(TIMEZONES)},
+    }, {200})
+
+SCENARIOS = {
+    "receiver_burst": receiver_burst,
+    "dashboard": dashboard,
+    "response": response_clicks,
+    "checkout": checkout,
+}
+
+# Driver
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for label, entry in samples.items():
+        latencies = sorted(entry["latencies"])
+        endpoints[label] = {
+            "requests": len(latencies),
+            "errors": entry["errors"],
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1e3, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1e3, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1e3, 2),
+            "max_ms": round(latencies[-1] * 1e3, 2) if latencies else 0.0,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 1),
+        "endpoints": dict(sorted(endpoints.items())),
+    }
+
+async def run_scenario(client, ctx, name, mix, concurrency, duration, seed):
+    samples = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(n):
+        rng = random.Random(f"{seed}:{name}:{n}")
+        while time.perf_counter() < deadline:
+            label, method, path, kwargs, accepted = mix(ctx, rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code in accepted
+            except httpx.HTTPError:
+                ok = False
+            entry = samples.setdefault(label, {"latencies": [], "errors": 0})
+            entry["latencies"].append(time.perf_counter() - start)
+            if not ok:
+                entry["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return summarize(samples, time.perf_counter() - started)
+
+def print_summary(name, result, baseline=None):
+    print(f"\n{name}: {result['requests']} requests, {result['throughput_rps']} req/s, {result['errors']} errors")
+    print(f"  {'endpoint':<48} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  {'p95 vs baseline':>15}")
+    base_endpoints = (baseline or {}).get("endpoints", {})
+    for label, stats in result["endpoints"].items():
+        delta = ""
+        base = base_endpoints.get(label)
+        if base and base["p95_ms"]:
+            delta = f"{(stats['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:+.1f}%"
+        print(f"  {label:<48} {stats['throughput_rps']:>8} {stats['errors']:>7} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+              f"{stats['p99_ms']:>8}  {delta:>15}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class Context:
+    def __init__(self, users, valentines, stub_razorpay):
+        self.users = users
+        self.valentines = valentines
+        self.stub_razorpay = stub_razorpay
+
+async def start_app(args):
+    """Import and start the app against the benchmark database"""
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db
+    import server
+
+    def create_order(data, timeout=None):
+        time.sleep(args.razorpay_latency)
+        return {"id": f"order_bench{random.getrandbits(48):012x}", "amount": data["amount"], "currency": data["currency"]}
+
+    server.razorpay_client.order.create = create_order
+    await server.app.router.startup()
+    # Queued emails stay in the throwaway database instead of reaching SMTP
+    await server.email_outbox.stop()
+    return server
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="cupid_bench")
+    parser.add_argument("--base-url", help="benchmark a running server (seeded through --db, so match its DB_NAME)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--valentines", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--razorpay-latency", type=float, default=0.15, help="stubbed order.create delay in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/load-<commit>-<time>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier result file to compare p95 latencies against")
+    parser.add_argument("--drop", action="store_true", help="drop the benchmark database afterwards")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+
+    mongo = AsyncIOMotorClient(args.mongo_url)
+    db = mongo[args.db]
+    await seed(db, args.users, args.valentines, random.Random(args.seed))
+
+    server = None
+    if args.base_url:
+        transport = None
+        base_url = args.base_url
+    else:
+        server = await start_app(args)
+        transport = httpx.ASGITransport(app=server.app)
+        base_url = "http://bench"
+    ctx = Context(args.users, args.valentines, stub_razorpay=server is not None)
+
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "target": args.base_url or "in-process",
+            "users": args.users,
+            "valentines": args.valentines,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30) as client:
+            for name in names:
+                result = await run_scenario(client, ctx, name, SCENARIOS[name], args.concurrency, args.duration, args.seed)
+                results["scenarios"][name] = result
+                print_summary(name, result, baseline.get("scenarios", {}).get(name))
+    finally:
+        if server is not None:
+            await server.app.router.shutdown()
+        if args.drop:
+            await mongo.drop_database(args.db)
+        mongo.close()
+
+    output = args.output or RESULTS_DIR / f"load-{results['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    print(f"\nresults written to {output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Benchmark: cost of serializing 1000 valentines for GET /api/valentines.
+
+"response_model" is FastAPI's default path: validate the Mongo documents as
+List[Valentine], dump them to JSON-compatible Python and encode with the
+stdlib json module. "orjson" is what the route does now: encode the projected
+documents directly.
+
+    python benchmarks/serialization.py
+"""
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import Valentine  # noqa: E402
+
+COUNT = 1000
+
+def make_valentines(count):
+    created = datetime(2026, 2, 1)
+    return [
+        {
+            "valentine_id": f"val_{i:012x}",
+            "user_id": "user_0123456789ab",
+            "template_id": "runaway_no",
+            "from_name": "Alex",
+            "to_name": f"Sam {i}",
+            "message": "I've been wanting to ask you this for so long... Will you be my Valentine? 💕",
+            "emoji_style": "cute",
+            "background_theme": "pink",
+            "unique_link": f"val_{i:012x}",
+            "payment_status": "completed" if i % 3 else "pending",
+            "payment_id": f"pay_{i:014x}" if i % 3 else None,
+            "response": "yes" if i % 4 == 0 else None,
+            "response_at": created + timedelta(hours=i) if i % 4 == 0 else None,
+            "created_at": created + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+ADAPTER = TypeAdapter(List[Valentine])
+
+def response_model_path(docs):
+    content = ADAPTER.dump_python(ADAPTER.validate_python(docs), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def orjson_path(docs):
+    return orjson.dumps(docs)
+
+def main():
+    docs = make_valentines(COUNT)
+    assert json.loads(response_model_path(docs)) == json.loads(orjson_path(docs))
+    
+    print(f"serializing {COUNT} valentines")
+    results = {}
+    for name, fn in (("response_model", response_model_path), ("orjson", orjson_path)):
+        seconds = min(timeit.repeat(lambda: fn(docs), number=20, repeat=5)) / 20
+        results[name] = seconds
+        print(f"{name:<15} {seconds * 1e3:>8.2f} ms  {len(fn(docs)):>8} bytes")
+    print(f"speedup         {results['response_model'] / results['orjson']:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Dispatched locally when a worker may have missed messages
+GAP = "gap"
+
+# Server error code for creating a collection that already exists (before MongoDB 7.0)
+NAMESPACE_EXISTS = 48
+
+
+class InvalidationBus:
+    """Broadcasts cache invalidations to every worker process.
+
+    In "local" mode handlers just run in-process, which is all a single worker
+    needs. In "mongo" mode each message is also appended to a capped collection
+    that every worker tails, so other workers apply it within moments. Handlers
+    run immediately in the publishing worker; a worker ignores its own
+    messages when they come back through the tail.
+    """
+
+    def __init__(self, db, mode=None, collection="invalidations", size=None):
+        self.db = db
+        self.mode = mode or os.environ.get("INVALIDATION_BUS", "local")
+        if self.mode not in ("local", "mongo"):
+            raise ValueError(f"Unknown invalidation bus mode: {self.mode}")
+        self.collection_name = collection
+        self.size = size or int(os.environ.get("INVALIDATION_BUS_SIZE", str(8 * 1024 * 1024)))
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Callable[[Dict], None]]] = {}
+        self._outgoing: List[Dict] = []
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._last_id = None
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    def on(self, kind: str, handler: Callable[[Dict], None]):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def publish(self, kind: str, payload: Dict):
+        """Apply a message here now and, in mongo mode, queue it for the other workers"""
+        self._dispatch(kind, payload)
+        if self.mode == "mongo":
+            self._outgoing.append({
+                "kind": kind,
+                "payload": payload,
+                "origin": self.origin,
+                "created_at": datetime.now(timezone.utc)
+            })
+            self._wakeup.set()
+
+    def _dispatch(self, kind: str, payload: Dict):
+        for handler in self._handlers.get(kind, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Invalidation handler for {kind} failed: {e}")
+
+    async def start(self):
+        if self.mode != "mongo":
+            return
+        try:
+            await self.db.create_collection(self.collection_name, capped=True, size=self.size)
+        except CollectionInvalid:
+            pass
+        except OperationFailure as e:
+            # Another worker created it between the driver's existence check and ours
+            if e.code != NAMESPACE_EXISTS:
+                raise
+        # A tailable cursor on an empty capped collection dies at once
+        if not await self.collection.find_one({}, {"_id": 1}):
+            await self.collection.insert_one({"kind": "start", "origin": self.origin})
+        self._tasks = [asyncio.create_task(self._tail()), asyncio.create_task(self._send())]
+        logger.info(f"Invalidation bus tailing {self.collection_name} as {self.origin}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._outgoing:
+            await self._flush()
+
+    async def _send(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self._flush()
+            except PyMongoError as e:
+                logger.error(f"Failed to broadcast {len(self._outgoing)} invalidations: {e}")
+                await asyncio.sleep(1)
+                self._wakeup.set()
+
+    async def _flush(self):
+        batch = self._outgoing
+        self._outgoing = []
+        try:
+            await self.collection.insert_many(batch, ordered=True)
+        except BaseException:
+            self._outgoing = batch + self._outgoing
+            raise
+
+    async def _tail(self):
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Invalidation bus tail interrupted: {e}")
+            await asyncio.sleep(1)
+
+    async def _follow(self):
+        if self._last_id is not None and not await self.collection.find_one({"_id": self._last_id}, {"_id": 1}):
+            # The capped collection wrapped past our position, so messages were lost
+            logger.warning("Invalidation bus fell behind; dropping local caches")
+            self._dispatch(GAP, {})
+            self._last_id = None
+        if self._last_id is None:
+            latest = await self.collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+            self._last_id = latest["_id"] if latest else None
+
+        # Documents come back in insertion order; skip up to the last one seen
+        skipping = self._last_id is not None
+        cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+        while cursor.alive:
+            async for message in cursor:
+                if skipping:
+                    skipping = message["_id"] != self._last_id
+                    continue
+                self._last_id = message["_id"]
+                if message.get("origin") != self.origin and "payload" in message:
+                    self._dispatch(message["kind"], message["payload"])
+            await asyncio.sleep(0.05)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Hashable
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindCounter:
+    """Buffers increments in memory and flushes them as one unordered bulk_write.
+
+    A flush happens every `flush_interval` seconds, as soon as `max_pending`
+    distinct keys are buffered, and on stop(). Counts from a failed flush are
+    put back and retried with the next one.
+    """
+
+    def __init__(self, collection, key_field: str, count_field: str, flush_interval=None, max_pending=None):
+        self.collection = collection
+        self.key_field = key_field
+        self.count_field = count_field
+        self.flush_interval = flush_interval or float(os.environ.get("VIEW_FLUSH_INTERVAL", "10"))
+        self.max_pending = max_pending or int(os.environ.get("VIEW_FLUSH_MAX_PENDING", "1000"))
+        self._pending: Counter = Counter()
+        self._task = None
+        self._full = asyncio.Event()
+
+    def incr(self, key: Hashable, amount: int = 1):
+        self._pending[key] += amount
+        if len(self._pending) >= self.max_pending:
+            self._full.set()
+
+    def pending(self, key: Hashable) -> int:
+        """Increments for `key` not yet written"""
+        return self._pending.get(key, 0)
+
+    async def flush(self) -> int:
+        """Write buffered counts; returns how many keys were flushed"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, Counter()
+        self._full.clear()
+        keys = list(batch)
+        try:
+            await self.collection.bulk_write(
+                [UpdateOne({self.key_field: key}, {"$inc": {self.count_field: batch[key]}}) for key in keys],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # Only the failed updates are retried; the rest were applied
+            failed = [keys[error["index"]] for error in e.details.get("writeErrors", [])]
+            logger.error(f"Failed to flush {len(failed)} of {len(keys)} {self.count_field} counters")
+            self._pending.update({key: batch[key] for key in failed})
+            return len(keys) - len(failed)
+        except PyMongoError as e:
+            logger.error(f"Failed to flush {len(keys)} {self.count_field} counters: {e}")
+            self._pending.update(batch)
+            return 0
+        except asyncio.CancelledError:
+            # Interrupted by stop(), which flushes again
+            self._pending.update(batch)
+            raise
+        return len(keys)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
@@ -2,19 +2,145 @@ import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import asyncio
+import html
 import logging
+import random
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+from metrics import track_external
 
 logger = logging.getLogger(__name__)
 
-# Email configuration
-EMAIL_HOST = "smtp.hostinger.com"
-EMAIL_PORT = 587
-EMAIL_USER = os.environ.get("TECHXAK_EMAIL", "hello@techxak.com")
-EMAIL_PASSWORD = os.environ.get("TECHXAK_EMAIL_PASSWORD", "")
+# Email configuration is read on first use, since server.py imports this module
+# before it loads backend/.env
+def get_sender_address():
+    return os.environ.get("TECHXAK_EMAIL", "hello@techxak.com")
 
-def get_email_footer():
-    """Get email footer with techxak.com branding"""
-    return """
+class PooledSMTP:
+    """An SMTP session owned by SMTPPool"""
+    
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+class SMTPPool:
+    """Pool of long-lived, authenticated SMTP sessions.
+    
+    At most `size` messages are in flight at once. Connections idle for longer
+    than `noop_interval` are checked with NOOP before reuse, and each connection
+    is retired after `max_messages` messages.
+    """
+    
+    def __init__(self, hostname, port, username=None, password=None, start_tls=True,
+                 size=4, max_messages=100, noop_interval=30.0, timeout=30.0):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.size = size
+        self.max_messages = max_messages
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle = []
+    
+    async def _connect(self):
+        # AUTH is attempted only with a username, so servers without it (e.g. aiosmtpd) work
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            start_tls=self.start_tls,
+            validate_certs=False,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        return PooledSMTP(smtp)
+    
+    async def _acquire(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.smtp.is_connected:
+                continue
+            if time.monotonic() - conn.last_used > self.noop_interval:
+                try:
+                    await conn.smtp.noop()
+                except aiosmtplib.SMTPException:
+                    await self._discard(conn)
+                    continue
+            return conn
+        return await self._connect()
+    
+    async def _release(self, conn):
+        conn.messages_sent += 1
+        conn.last_used = time.monotonic()
+        if conn.messages_sent >= self.max_messages:
+            await self._discard(conn)
+        else:
+            self._idle.append(conn)
+    
+    async def _discard(self, conn):
+        try:
+            await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+    
+    async def send_message(self, message):
+        async with self._semaphore:
+            conn = await self._acquire()
+            try:
+                await conn.smtp.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError):
+                # The server dropped a pooled connection; retry once on a fresh one
+                conn.smtp.close()
+                conn = await self._connect()
+                try:
+                    await conn.smtp.send_message(message)
+                except Exception:
+                    await self._discard(conn)
+                    raise
+            except Exception:
+                await self._discard(conn)
+                raise
+            await self._release(conn)
+    
+    async def close(self):
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._discard(conn) for conn in idle))
+
+smtp_pool = None
+
+def get_smtp_pool():
+    """Shared SMTP pool, created on first use"""
+    global smtp_pool
+    if smtp_pool is None:
+        password = os.environ.get("TECHXAK_EMAIL_PASSWORD", "")
+        smtp_pool = SMTPPool(
+            os.environ.get("SMTP_HOST", "smtp.hostinger.com"),
+            int(os.environ.get("SMTP_PORT", "587")),
+            # Defaults to the sender address when a password is set; empty skips AUTH
+            username=os.environ.get("SMTP_USERNAME", get_sender_address() if password else ""),
+            password=password,
+            start_tls=os.environ.get("SMTP_START_TLS", "true").lower() == "true",
+            size=int(os.environ.get("SMTP_POOL_SIZE", "4")),
+            max_messages=int(os.environ.get("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")),
+            noop_interval=float(os.environ.get("SMTP_NOOP_INTERVAL", "30"))
+        )
+    return smtp_pool
+
+async def close_smtp_pool():
+    if smtp_pool is not None:
+        await smtp_pool.close()
+
+# Templates are f-strings over module-level constants: only the user-supplied
+# values, HTML-escaped, are filled in per message.
+EMAIL_FOOTER = """
     <div style="margin-top: 40px; padding-top: 20px; border-top: 2px solid #FFE4E6; text-align: center;">
         <p style="color: #666; font-size: 12px; margin: 0;">
             Created with 💖 by <a href="https://techxak.com" style="color: #FF6B9D; text-decoration: none; font-weight: bold;">techxak.com</a>
@@ -25,8 +151,53 @@ def get_email_footer():
     </div>
     """
 
+def get_email_footer():
+    """Get email footer with techxak.com branding"""
+    return EMAIL_FOOTER
+
+TEXT_FOOTER = """
+--
+Created with 💖 by techxak.com
+Building digital experiences that matter
+"""
+
+DASHBOARD_URL = "https://heartlinks-2.preview.emergentagent.com/dashboard"
+
+# Static pieces of the response email for "yes" and for anything else
+RESPONSE_VARIANTS = {
+    "yes": {
+        "response_emoji": "💕",
+        "response_text": "said YES!",
+        "background_color": "#E8F5E9",
+        "accent_color": "#4CAF50",
+        "closing_block": """
+                <div style="background-color: #E8F5E9; padding: 20px; border-radius: 10px; margin: 20px 0;">
+                    <p style="color: #2E7D32; margin: 0; font-size: 16px; text-align: center;">
+                        🎊 Congratulations! Time to plan that special moment! 🎊
+                    </p>
+                </div>
+                """,
+        "closing_text": "🎊 Congratulations! Time to plan that special moment! 🎊",
+    },
+    "no": {
+        "response_emoji": "🤔",
+        "response_text": "clicked No (but don't worry, they might change their mind! 😉)",
+        "background_color": "#FFF3E0",
+        "accent_color": "#FF9800",
+        "closing_block": """
+                <div style="background-color: #FFF3E0; padding: 20px; border-radius: 10px; margin: 20px 0;">
+                    <p style="color: #E65100; margin: 0; font-size: 16px; text-align: center;">
+                        💪 Don't give up! Try another template or send a sweet follow-up message!
+                    </p>
+                </div>
+                """,
+        "closing_text": "💪 Don't give up! Try another template or send a sweet follow-up message!",
+    },
+}
+
 def get_welcome_email_template(user_name):
     """Welcome email template"""
+    user_name = html.escape(user_name)
     return f"""
     <!DOCTYPE html>
     <html>
@@ -76,18 +247,40 @@ def get_welcome_email_template(user_name):
             </div>
             
             <!-- Footer -->
-            {get_email_footer()}
+            {EMAIL_FOOTER}
         </div>
     </body>
     </html>
     """
 
+def get_welcome_email_text(user_name):
+    """Plain-text welcome email"""
+    return f"""Hey {user_name}! 🎉
+
+We're so excited to have you here! You've just unlocked the most fun way to ask "Will you be my Valentine?"
+
+What you can do:
+- Choose from 5 hilarious interactive templates
+- Customize with your personal message
+- Get instant shareable links
+- Track responses in your dashboard
+
+Ready to create some Valentine magic? Head to your dashboard and let's make someone smile! 😊
+
+Go to Dashboard: {DASHBOARD_URL}
+{TEXT_FOOTER}"""
+
 def get_response_email_template(creator_name, to_name, response, valentine_link):
     """Email template for valentine response notification"""
-    response_emoji = "💕" if response == "yes" else "🤔"
-    response_text = "said YES!" if response == "yes" else "clicked No (but don't worry, they might change their mind! 😉)"
-    background_color = "#E8F5E9" if response == "yes" else "#FFF3E0"
-    accent_color = "#4CAF50" if response == "yes" else "#FF9800"
+    variant = RESPONSE_VARIANTS["yes" if response == "yes" else "no"]
+    response_emoji = variant["response_emoji"]
+    response_text = variant["response_text"]
+    background_color = variant["background_color"]
+    accent_color = variant["accent_color"]
+    closing_block = variant["closing_block"]
+    creator_name = html.escape(creator_name)
+    to_name = html.escape(to_name)
+    valentine_link = html.escape(valentine_link)
     
     return f"""
     <!DOCTYPE html>
@@ -123,19 +316,7 @@ def get_response_email_template(creator_name, to_name, response, valentine_link)
                     </h3>
                 </div>
                 
-                {'''
-                <div style="background-color: #E8F5E9; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                    <p style="color: #2E7D32; margin: 0; font-size: 16px; text-align: center;">
-                        🎊 Congratulations! Time to plan that special moment! 🎊
-                    </p>
-                </div>
-                ''' if response == "yes" else '''
-                <div style="background-color: #FFF3E0; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                    <p style="color: #E65100; margin: 0; font-size: 16px; text-align: center;">
-                        💪 Don't give up! Try another template or send a sweet follow-up message!
-                    </p>
-                </div>
-                '''}
+                {closing_block}
                 
                 <p style="color: #666; font-size: 16px; line-height: 1.6; margin: 30px 0 20px 0;">
                     Want to check all your valentines and responses?
@@ -154,32 +335,48 @@ def get_response_email_template(creator_name, to_name, response, valentine_link)
             </div>
             
             <!-- Footer -->
-            {get_email_footer()}
+            {EMAIL_FOOTER}
         </div>
     </body>
     </html>
     """
 
-async def send_email(to_email: str, subject: str, html_content: str):
-    """Send email using aiosmtplib"""
+def get_response_email_text(creator_name, to_name, response, valentine_link):
+    """Plain-text valentine response notification"""
+    variant = RESPONSE_VARIANTS["yes" if response == "yes" else "no"]
+    response_emoji = variant["response_emoji"]
+    response_text = variant["response_text"]
+    closing_text = variant["closing_text"]
+    
+    return f"""Hey {creator_name}! 🎉
+
+Great news! {to_name} just responded to your Valentine surprise!
+
+{response_emoji} {to_name} {response_text}
+
+{closing_text}
+
+Want to check all your valentines and responses?
+View Dashboard: {DASHBOARD_URL}
+View Valentine: {valentine_link}
+{TEXT_FOOTER}"""
+
+async def send_email(to_email: str, subject: str, html_content: str, text_content: Optional[str] = None):
+    """Send email over a pooled SMTP connection"""
     try:
         message = MIMEMultipart("alternative")
-        message["From"] = f"Cupid's Prank <{EMAIL_USER}>"
+        message["From"] = f"Cupid's Prank <{get_sender_address()}>"
         message["To"] = to_email
         message["Subject"] = subject
         
+        # Clients show the last alternative they support, so plain text goes first
+        if text_content:
+            message.attach(MIMEText(text_content, "plain"))
         html_part = MIMEText(html_content, "html")
         message.attach(html_part)
         
-        await aiosmtplib.send(
-            message,
-            hostname=EMAIL_HOST,
-            port=EMAIL_PORT,
-            username=EMAIL_USER,
-            password=EMAIL_PASSWORD,
-            start_tls=True,
-            validate_certs=False
-        )
+        with track_external("smtp"):
+            await get_smtp_pool().send_message(message)
         
         logger.info(f"Email sent successfully to {to_email}")
         return True
@@ -192,11 +389,120 @@ async def send_welcome_email(user_email: str, user_name: str):
     """Send welcome email to new user"""
     subject = "Welcome to Cupid's Prank! 💖"
     html_content = get_welcome_email_template(user_name)
-    return await send_email(user_email, subject, html_content)
+    text_content = get_welcome_email_text(user_name)
+    return await send_email(user_email, subject, html_content, text_content)
 
 async def send_response_notification(creator_email: str, creator_name: str, to_name: str, response: str, valentine_id: str):
     """Send email notification when someone responds to valentine"""
     valentine_link = f"https://heartlinks-2.preview.emergentagent.com/v/{valentine_id}"
     subject = f"{'💕 YES!' if response == 'yes' else '🤔 Response'} {to_name} responded to your Valentine!"
     html_content = get_response_email_template(creator_name, to_name, response, valentine_link)
-    return await send_email(creator_email, subject, html_content)
+    text_content = get_response_email_text(creator_name, to_name, response, valentine_link)
+    return await send_email(creator_email, subject, html_content, text_content)
+
+# Outbox job kinds and the sender that delivers each of them
+EMAIL_JOBS = {
+    "welcome": send_welcome_email,
+    "response": send_response_notification,
+}
+
+class EmailOutbox:
+    """Mongo-backed email queue drained by a pool of background workers.
+    
+    Requests only insert a job; workers claim due jobs, send them, and retry
+    failures with exponential backoff until they are dead-lettered.
+    """
+    
+    def __init__(self, db, workers=None, max_attempts=None, poll_interval=None):
+        self.collection = db.email_outbox
+        self.workers = workers or int(os.environ.get("EMAIL_WORKERS", "2"))
+        self.max_attempts = max_attempts or int(os.environ.get("EMAIL_MAX_ATTEMPTS", "5"))
+        self.poll_interval = poll_interval or float(os.environ.get("EMAIL_POLL_INTERVAL", "5"))
+        self.retry_base_delay = float(os.environ.get("EMAIL_RETRY_BASE_DELAY", "30"))
+        self.retry_max_delay = float(os.environ.get("EMAIL_RETRY_MAX_DELAY", "3600"))
+        # Jobs left "sending" this long (e.g. by a crashed worker) are claimed again
+        self.lock_timeout = float(os.environ.get("EMAIL_LOCK_TIMEOUT", "300"))
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+    
+    async def enqueue(self, kind: str, **params):
+        """Queue an email for background delivery"""
+        if kind not in EMAIL_JOBS:
+            raise ValueError(f"Unknown email job kind: {kind}")
+        now = datetime.now(timezone.utc)
+        await self.collection.insert_one({
+            "kind": kind,
+            "params": params,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "last_error": None
+        })
+        self._wakeup.set()
+    
+    def start(self):
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run(i)))
+        logger.info(f"Started {self.workers} email outbox workers")
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _run(self, worker_id: int):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email worker {worker_id} failed to claim a job: {e}")
+                job = None
+            
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            await self._process(job)
+    
+    async def _claim(self):
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "locked_at": {"$lte": now - timedelta(seconds=self.lock_timeout)}}
+            ]},
+            {"$set": {"status": "sending", "locked_at": now}, "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def _process(self, job):
+        try:
+            sent = await EMAIL_JOBS[job["kind"]](**job["params"])
+            error = None if sent else "send failed"
+        except Exception as e:
+            error = str(e)
+        
+        now = datetime.now(timezone.utc)
+        if error is None:
+            update = {"status": "sent", "sent_at": now, "last_error": None}
+        elif job["attempts"] >= self.max_attempts:
+            logger.error(f"Email job {job['_id']} dead-lettered after {job['attempts']} attempts: {error}")
+            update = {"status": "dead", "last_error": error}
+        else:
+            delay = min(self.retry_base_delay * 2 ** (job["attempts"] - 1), self.retry_max_delay)
+            delay *= random.uniform(0.8, 1.2)
+            update = {
+                "status": "pending",
+                "next_attempt_at": now + timedelta(seconds=delay),
+                "last_error": error
+            }
+        await self.collection.update_one({"_id": job["_id"]}, {"$set": update, "$unset": {"locked_at": ""}})
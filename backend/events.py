@@ -0,0 +1,71 @@
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Set
+
+import orjson
+
+# Sent instead of the events a slow subscriber missed; the client refetches
+RESET_EVENT = {"type": "reset"}
+
+
+class EventHub:
+    """In-process fan-out of per-user events to streaming subscribers.
+
+    Each subscriber is a bounded queue, so an idle connection costs one queue
+    and a publish only touches the queues of the user it concerns.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id: Optional[str] = None) -> int:
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def broadcast(self, event: Dict):
+        """Send an event to every subscriber, e.g. RESET_EVENT after missed updates"""
+        for user_id in list(self._subscribers):
+            self.publish(user_id, event)
+
+    def publish(self, user_id: str, event: Dict):
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Drop the backlog and tell the client to resynchronize
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESET_EVENT)
+
+
+def format_sse(event: Dict) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+
+async def sse_stream(hub: EventHub, user_id: str, keepalive: float) -> AsyncIterator[bytes]:
+    """Server-Sent Events for one user, with comment lines to keep proxies from timing out"""
+    queue = hub.subscribe(user_id)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(user_id, queue)
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException, Request
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """Replays the first response to requests retried with the same Idempotency-Key.
+
+    The first request claims the key with a pending record and stores its
+    result; duplicates replay it, waiting while it is still in flight. A
+    failed request releases the key so the next retry runs again, and a
+    pending claim older than `lock_timeout` (its process likely died) is
+    taken over by the next retry.
+    """
+
+    def __init__(self, db, ttl=None, wait_timeout=None, lock_timeout=None):
+        self.collection = db.idempotency_keys
+        self.ttl = ttl or float(os.environ.get("IDEMPOTENCY_TTL", str(24 * 60 * 60)))
+        self.wait_timeout = wait_timeout or float(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+        self.lock_timeout = lock_timeout or float(
+            os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", str(6 * self.wait_timeout))
+        )
+        self.poll_interval = 0.1
+        self._flights = SingleFlight()
+
+    async def run(self, request: Request, scope: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` once per (scope, Idempotency-Key); without the header it always runs"""
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await fn()
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} is too long")
+
+        record_key = f"{scope}:{key}"
+        # Reusing a key for a different request body is a client error, not a replay
+        fingerprint = hashlib.blake2b(await request.body(), digest_size=16).hexdigest()
+        # Duplicates within this process share one flight; across processes they meet in Mongo
+        return await self._flights.do((record_key, fingerprint), lambda: self._claim(record_key, fingerprint, fn))
+
+    async def _claim(self, record_key: str, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        now = datetime.now(timezone.utc)
+        lock_id = uuid.uuid4().hex
+        try:
+            await self.collection.insert_one({
+                "key": record_key,
+                "fingerprint": fingerprint,
+                "status": "pending",
+                "lock_id": lock_id,
+                "locked_at": now,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl)
+            })
+        except DuplicateKeyError:
+            return await self._replay(record_key, fingerprint, fn)
+        return await self._execute(record_key, lock_id, fn)
+
+    async def _execute(self, record_key: str, lock_id: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` under our claim on the key and store its result"""
+        try:
+            result = await fn()
+        except BaseException:
+            await self.collection.delete_one({"key": record_key, "status": "pending", "lock_id": lock_id})
+            raise
+
+        # Stored as JSON so a replay serializes exactly like the original response
+        try:
+            stored = await self.collection.update_one(
+                {"key": record_key, "lock_id": lock_id},
+                {"$set": {"status": "done", "response": orjson.dumps(result)}}
+            )
+            if stored.matched_count == 0:
+                logger.warning(f"Idempotency claim on {record_key} was taken over before it finished")
+        except PyMongoError as e:
+            logger.error(f"Failed to store idempotent response for {record_key}: {e}")
+        return result
+
+    def _is_stale(self, record: dict) -> bool:
+        locked_at = record.get("locked_at") or record["created_at"]
+        if locked_at.tzinfo is None:
+            locked_at = locked_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - locked_at >= timedelta(seconds=self.lock_timeout)
+
+    async def _take_over(self, record_key: str) -> Optional[str]:
+        """Claim a pending record whose owner has held it past the lock timeout"""
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=self.lock_timeout)
+        lock_id = uuid.uuid4().hex
+        result = await self.collection.update_one(
+            {"key": record_key, "status": "pending", "$or": [
+                {"locked_at": {"$lte": stale}},
+                {"locked_at": {"$exists": False}, "created_at": {"$lte": stale}}
+            ]},
+            {"$set": {"lock_id": lock_id, "locked_at": now}}
+        )
+        return lock_id if result.modified_count else None
+
+    async def _replay(self, record_key: str, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            record = await self.collection.find_one({"key": record_key}, {"_id": 0})
+            if record is None:
+                # The original request failed and released the key
+                return await self._claim(record_key, fingerprint, fn)
+            if record["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{IDEMPOTENCY_HEADER} was already used for a different request"
+                )
+            if record["status"] == "done":
+                return orjson.loads(record["response"])
+            lock_id = await self._take_over(record_key) if self._is_stale(record) else None
+            if lock_id:
+                logger.warning(f"Took over stale idempotency claim on {record_key}")
+                return await self._execute(record_key, lock_id, fn)
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress"
+                )
+            await asyncio.sleep(self.poll_interval)
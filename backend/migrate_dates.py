@@ -0,0 +1,115 @@
+"""Rewrite legacy ISO-string datetimes as native BSON dates.
+
+Safe to run while the API is serving traffic: documents are walked in _id
+order in batches, each field is only rewritten if it still holds the string
+that was read, and progress is checkpointed so an interrupted run resumes
+where it stopped. Once every collection is done the migration is marked
+complete and the API stops converting dates on read (after a restart).
+
+    python migrate_dates.py [--batch-size 1000] [--restart]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+MIGRATION_ID = "normalize_dates"
+
+# Datetime fields that legacy rows may hold as ISO strings
+DATE_FIELDS = {
+    "valentines": ["created_at", "response_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "users": ["created_at"],
+}
+
+logger = logging.getLogger(__name__)
+
+def parse_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+async def is_complete(db) -> bool:
+    """True once every collection has been migrated"""
+    marker = await db.migrations.find_one({"_id": MIGRATION_ID}, {"completed": 1})
+    return bool(marker and marker.get("completed"))
+
+async def migrate_collection(db, collection: str, fields: list, batch_size: int) -> int:
+    """Migrate one collection from its checkpoint; returns the number of fields rewritten"""
+    checkpoint_id = f"{MIGRATION_ID}:{collection}"
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("completed"):
+        return 0
+    
+    last_id = checkpoint.get("last_id")
+    rewritten = 0
+    projection = {field: 1 for field in fields}
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await db[collection].find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        
+        operations = []
+        for doc in batch:
+            for field in fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    # Match on the old string so a concurrent write is never overwritten
+                    operations.append(UpdateOne(
+                        {"_id": doc["_id"], field: value},
+                        {"$set": {field: parse_datetime(value)}}
+                    ))
+        if operations:
+            result = await db[collection].bulk_write(operations, ordered=False)
+            rewritten += result.modified_count
+        
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.info(f"{collection}: migrated through {last_id} ({rewritten} fields rewritten)")
+    
+    await db.migrations.update_one({"_id": checkpoint_id}, {"$set": {"completed": True}}, upsert=True)
+    return rewritten
+
+async def run(db, batch_size: int = 1000, restart: bool = False):
+    if restart:
+        await db.migrations.delete_many({"_id": {"$regex": f"^{MIGRATION_ID}"}})
+    
+    for collection, fields in DATE_FIELDS.items():
+        rewritten = await migrate_collection(db, collection, fields, batch_size)
+        logger.info(f"{collection}: done, {rewritten} fields rewritten")
+    
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"completed": True, "completed_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info("Date migration complete; restart the API to drop read-time conversions")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and start over")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        asyncio.run(run(client[os.environ['DB_NAME']], args.batch_size, args.restart))
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Webhook events that mean the valentine's order has been paid
+PAID_EVENTS = {"order.paid", "payment.captured"}
+
+
+def verify_webhook_signature(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """Check X-Razorpay-Signature (hex HMAC-SHA256 of the raw body) in constant time"""
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected.encode(), signature.encode())
+
+
+def parse_payment_event(payload: Dict) -> Optional[Dict]:
+    """Reduce a Razorpay webhook payload to the fields reconciliation needs.
+
+    Returns None for events that don't settle a payment. The valentine is the
+    order's receipt (set by create-order) or the checkout's valentine_id note.
+    """
+    if not isinstance(payload, dict) or payload.get("event") not in PAID_EVENTS:
+        return None
+    entities = payload.get("payload") or {}
+    payment = (entities.get("payment") or {}).get("entity") or {}
+    order = (entities.get("order") or {}).get("entity") or {}
+    notes = payment.get("notes") if isinstance(payment.get("notes"), dict) else {}
+    payment_id = payment.get("id")
+    valentine_id = order.get("receipt") or notes.get("valentine_id")
+    if not isinstance(payment_id, str) or not isinstance(valentine_id, str):
+        return None
+    return {
+        "payment_id": payment_id,
+        "order_id": payment.get("order_id") or order.get("id"),
+        "valentine_id": valentine_id,
+        "event": payload["event"],
+        "amount": payment.get("amount"),
+        "currency": payment.get("currency")
+    }
+
+
+class PaymentReconciler:
+    """Applies queued Razorpay webhook events to valentines in batches.
+
+    Events are stored once per payment_id, and each update only matches a
+    valentine that isn't completed yet, so replays and races with
+    /payment/verify are no-ops.
+    """
+
+    def __init__(self, db, on_applied: Callable[[List[Dict]], Awaitable[None]] = None,
+                 batch_size=None, poll_interval=None):
+        self.db = db
+        self.collection = db.payment_events
+        self.on_applied = on_applied
+        self.batch_size = batch_size or int(os.environ.get("PAYMENT_RECONCILE_BATCH_SIZE", "100"))
+        self.poll_interval = poll_interval or float(os.environ.get("PAYMENT_RECONCILE_INTERVAL", "5"))
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, event: Dict) -> bool:
+        """Queue a parsed event; False if this payment was already queued"""
+        try:
+            await self.collection.insert_one({
+                **event,
+                "status": "pending",
+                "received_at": datetime.now(timezone.utc)
+            })
+        except DuplicateKeyError:
+            return False
+        self._wakeup.set()
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                applied = await self.reconcile_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Payment reconciliation failed: {e}")
+                applied = 0
+
+            if applied < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def reconcile_batch(self) -> int:
+        """Apply up to batch_size pending events; returns how many were processed"""
+        events = await self.collection.find(
+            {"status": "pending"},
+            {"_id": 1, "payment_id": 1, "valentine_id": 1}
+        ).sort("received_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not events:
+            return 0
+
+        valentine_ids = list({event["valentine_id"] for event in events})
+        known = {
+            valentine["valentine_id"]: valentine
+            async for valentine in self.db.valentines.find(
+                {"valentine_id": {"$in": valentine_ids}},
+                {"_id": 0, "valentine_id": 1, "user_id": 1, "payment_status": 1}
+            )
+        }
+
+        updates = []
+        changed = []
+        for event in events:
+            valentine = known.get(event["valentine_id"])
+            if valentine is None or valentine.get("payment_status") == "completed":
+                continue
+            updates.append(UpdateOne(
+                {"valentine_id": event["valentine_id"], "payment_status": {"$ne": "completed"}},
+                {"$set": {"payment_status": "completed", "payment_id": event["payment_id"]}}
+            ))
+            # Several events for one valentine: only the first one applies
+            valentine["payment_status"] = "completed"
+            changed.append(valentine)
+
+        if updates:
+            await self.db.valentines.bulk_write(updates, ordered=False)
+
+        now = datetime.now(timezone.utc)
+        unmatched = [event["_id"] for event in events if event["valentine_id"] not in known]
+        applied = [event["_id"] for event in events if event["valentine_id"] in known]
+        if applied:
+            await self.collection.update_many(
+                {"_id": {"$in": applied}},
+                {"$set": {"status": "applied", "processed_at": now}}
+            )
+        if unmatched:
+            # Left for support; they don't expire with the applied events
+            await self.collection.update_many(
+                {"_id": {"$in": unmatched}},
+                {"$set": {"status": "unmatched", "checked_at": now}}
+            )
+            logger.warning(f"{len(unmatched)} payment events matched no valentine")
+
+        if changed and self.on_applied:
+            try:
+                await self.on_applied(changed)
+            except PyMongoError as e:
+                logger.error(f"Post-reconciliation hook failed: {e}")
+        return len(events)
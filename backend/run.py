@@ -0,0 +1,30 @@
+"""Multi-worker entry point.
+
+    python run.py --workers 4 --port 8001
+
+Every worker is a separate process with its own in-process caches, so with
+more than one worker the invalidation bus defaults to Mongo
+(INVALIDATION_BUS=mongo) and invalidations reach every worker. Background
+jobs are safe to run in each worker: email and payment jobs are claimed or
+applied conditionally, and view counts are flushed with $inc.
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")))
+    args = parser.parse_args(argv)
+
+    if args.workers > 1:
+        os.environ.setdefault("INVALIDATION_BUS", "mongo")
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
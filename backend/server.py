@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Cookie
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Cookie, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReadPreference
+from pymongo.errors import PyMongoError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
@@ -12,23 +14,177 @@ import uuid
 import httpx
 from datetime import datetime, timezone, timedelta
 import razorpay
+import requests
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import hmac
 import hashlib
-from email_service import send_welcome_email, send_response_notification
+import base64
+import json
+import re
+import orjson
+from email_service import EmailOutbox, close_smtp_pool
+from bus import GAP, InvalidationBus
+from cache import TTLCache, SingleFlight
+from counters import WriteBehindCounter
+from events import RESET_EVENT, EventHub, sse_stream
+from idempotency import IdempotencyStore
+from metrics import MetricsMiddleware, MongoCommandTimer, render_metrics, track_external
+from payments import PaymentReconciler, parse_payment_event, verify_webhook_signature
+from session_tokens import RevocationList, is_signed_token, new_session_id, sign_session_token, verify_session_token
+import migrate_dates
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; pool size, compression and timeouts are tunable from .env
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    write_concern = os.environ.get('MONGO_WRITE_CONCERN', 'majority')
+    options = {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000')),
+        "w": int(write_concern) if write_concern.isdigit() else write_concern,
+        "event_listeners": [MongoCommandTimer()],
+    }
+    if os.environ.get('MONGO_MAX_IDLE_TIME_MS'):
+        options["maxIdleTimeMS"] = int(os.environ['MONGO_MAX_IDLE_TIME_MS'])
+    # e.g. "zstd,snappy,zlib"; zstd and snappy need the zstandard / python-snappy packages
+    if os.environ.get('MONGO_COMPRESSORS'):
+        options["compressors"] = os.environ['MONGO_COMPRESSORS']
+    # Client-side deadline for each operation, including retries
+    if os.environ.get('MONGO_TIMEOUT_MS'):
+        options["timeoutMS"] = int(os.environ['MONGO_TIMEOUT_MS'])
+    return AsyncIOMotorClient(mongo_url, **options)
+
+client = create_mongo_client()
 db = client[os.environ['DB_NAME']]
 
+# Read preference for public, read-only valentine lookups. Secondaries may lag
+# the primary, and the receiver page caches what it reads for VALENTINE_CACHE_TTL.
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+public_read_preference = os.environ.get('MONGO_PUBLIC_READ_PREFERENCE', 'primary')
+if public_read_preference not in READ_PREFERENCES:
+    raise RuntimeError(
+        f"MONGO_PUBLIC_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}, "
+        f"not {public_read_preference!r}"
+    )
+PUBLIC_READ_PREFERENCE = READ_PREFERENCES[public_read_preference]
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', '4'))
+
+def public_reads(collection):
+    """`collection` with the read preference for public read-only lookups"""
+    return collection.with_options(read_preference=PUBLIC_READ_PREFERENCE)
+
+# Background email delivery
+email_outbox = EmailOutbox(db)
+
+# Replays responses to POSTs retried with the same Idempotency-Key header
+idempotency = IdempotencyStore(db)
+
 # Razorpay client
 razorpay_client = razorpay.Client(auth=(os.environ.get('RAZORPAY_KEY_ID', ''), os.environ.get('RAZORPAY_KEY_SECRET', '')))
 
+# Shared secret configured on the Razorpay dashboard for /payment/razorpay-webhook
+RAZORPAY_WEBHOOK_SECRET = os.environ.get('RAZORPAY_WEBHOOK_SECRET', '')
+
+# The Razorpay SDK is blocking, so its calls run on a bounded thread pool whose
+# size also caps the SDK's pooled HTTPS connections
+RAZORPAY_MAX_CONCURRENCY = int(os.environ.get('RAZORPAY_MAX_CONCURRENCY', '8'))
+RAZORPAY_TIMEOUT = (
+    float(os.environ.get('RAZORPAY_CONNECT_TIMEOUT', '5')),
+    float(os.environ.get('RAZORPAY_READ_TIMEOUT', '15'))
+)
+razorpay_client.session.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=RAZORPAY_MAX_CONCURRENCY
+))
+razorpay_executor = ThreadPoolExecutor(max_workers=RAZORPAY_MAX_CONCURRENCY, thread_name_prefix="razorpay")
+
+async def run_razorpay(fn, *args, **kwargs):
+    """Run a blocking Razorpay SDK call without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, timeout=RAZORPAY_TIMEOUT, **kwargs)
+    return await loop.run_in_executor(razorpay_executor, call)
+
+# Shared HTTP client for the OAuth session exchange, opened at startup
+OAUTH_SESSION_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive client with explicit timeouts and connection limits"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            float(os.environ.get('HTTP_READ_TIMEOUT', '10')),
+            connect=float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5'))
+        ),
+        limits=httpx.Limits(
+            max_connections=int(os.environ.get('HTTP_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.environ.get('HTTP_MAX_KEEPALIVE_CONNECTIONS', '20')),
+            keepalive_expiry=float(os.environ.get('HTTP_KEEPALIVE_EXPIRY', '30'))
+        )
+    )
+
+# In-process cache of resolved sessions: session_token -> (user_doc, expires_at)
+session_cache = TTLCache(
+    maxsize=int(os.environ.get('SESSION_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', '60'))
+)
+# Coalesces concurrent session cache misses per token
+session_loads = SingleFlight()
+
+# When enabled, /auth/session issues HMAC-signed tokens that are verified without
+# a user_sessions read; logouts are tracked in a periodically refreshed deny-set
+SIGNED_SESSIONS = os.environ.get('SIGNED_SESSIONS', 'false').lower() == 'true'
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '').encode()
+if SIGNED_SESSIONS and not SESSION_SECRET:
+    raise RuntimeError("SESSION_SECRET must be set when SIGNED_SESSIONS is enabled")
+revoked_sessions = RevocationList(db)
+
+# Read-through cache of rendered public valentine pages: valentine_id -> (JSON bytes, ETag)
+valentine_cache = TTLCache(
+    maxsize=int(os.environ.get('VALENTINE_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('VALENTINE_CACHE_TTL', '30'))
+)
+valentine_loads = SingleFlight()
+
+# When enabled, only the first receiver response is kept and later ones get 409
+FIRST_RESPONSE_WINS = os.environ.get('FIRST_RESPONSE_WINS', 'false').lower() == 'true'
+
+# Set at startup once migrate_dates.py has rewritten every legacy string datetime
+DATES_NORMALIZED = False
+
+# When enabled, per-user dashboard stats are kept in user_stats and updated incrementally
+STATS_COUNTERS = os.environ.get('STATS_COUNTERS', 'false').lower() == 'true'
+# Seconds before an unfinished counter seed is abandoned and retried
+STATS_SEED_TIMEOUT = float(os.environ.get('STATS_SEED_TIMEOUT', '60'))
+
+# Creator emails for legacy valentines without creator_email: user_id -> email
+creator_email_cache = TTLCache(maxsize=10000, ttl=3600)
+
+# Receiver page opens per valentine, buffered in memory and flushed in bulk
+valentine_views = WriteBehindCounter(db.valentines, "valentine_id", "view_count")
+
+# Response and payment events pushed to open dashboards over SSE
+dashboard_events = EventHub()
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', '15'))
+SSE_MAX_CONNECTIONS_PER_USER = int(os.environ.get('SSE_MAX_CONNECTIONS_PER_USER', '5'))
+
+# Carries cache invalidations and dashboard events to every worker; set
+# INVALIDATION_BUS=mongo when running more than one (run.py does this)
+invalidation_bus = InvalidationBus(db)
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -71,6 +227,15 @@ class Valentine(BaseModel):
     response_at: Optional[datetime] = None
     created_at: datetime
 
+# Projection returning exactly the fields of the Valentine model
+VALENTINE_PROJECTION = {"_id": 0, **{field: 1 for field in Valentine.model_fields}}
+
+class CreatorValentine(Valentine):
+    """A valentine as its creator sees it on the dashboard"""
+    view_count: int = 0
+
+CREATOR_VALENTINE_PROJECTION = {"_id": 0, **{field: 1 for field in CreatorValentine.model_fields}}
+
 class ValentineCreate(BaseModel):
     template_id: str
     from_name: str
@@ -79,6 +244,10 @@ class ValentineCreate(BaseModel):
     emoji_style: str = "cute"
     background_theme: str = "pink"
 
+class ValentineBatchCreate(BaseModel):
+    bundle_type: str  # single, bundle_3, bundle_5
+    valentines: List[ValentineCreate]
+
 class PaymentCreate(BaseModel):
     valentine_id: str
     amount: int
@@ -94,46 +263,78 @@ class PaymentVerify(BaseModel):
 class ValentineResponse(BaseModel):
     response: str
 
+# Number of links provisioned by each purchasable bundle
+BUNDLE_SIZES = {"single": 1, "bundle_3": 3, "bundle_5": 5}
+
+# Regional pricing table, keyed by region
+PRICING_REGIONS = {
+    "south_asia": {
+        "currency": "INR",
+        "symbol": "₹",
+        "region": "South Asia",
+        "single": 9.99,
+        "bundle_3": 24.99,  # ₹8.33/link - Save 16%
+        "bundle_5": 34.99   # ₹7/link - Save 30%
+    },
+    "international": {
+        "currency": "USD",
+        "symbol": "$",
+        "region": "International",
+        "single": 2.99,
+        "bundle_3": 7.49,   # $2.50/link - Save 16%
+        "bundle_5": 10.49   # $2.10/link - Save 30%
+    }
+}
+DEFAULT_PRICING_REGION = "international"
+
+# IANA timezones with non-default pricing; every other zone is International
+PRICING_REGION_BY_TIMEZONE = {
+    "Asia/Kolkata": "south_asia", "Asia/Calcutta": "south_asia",  # India
+    "Asia/Karachi": "south_asia",  # Pakistan
+    "Asia/Dhaka": "south_asia",  # Bangladesh
+    "Asia/Colombo": "south_asia",  # Sri Lanka
+    "Asia/Kathmandu": "south_asia",  # Nepal
+    "Asia/Thimphu": "south_asia",  # Bhutan
+    "Indian/Maldives": "south_asia",  # Maldives
+    "Asia/Kabul": "south_asia"  # Afghanistan
+}
+
 # Helper function to get pricing based on timezone
 def get_regional_pricing_by_timezone(timezone_str: str) -> dict:
-    """Get pricing based on timezone"""
-    # India and neighboring countries timezones
-    south_asian_timezones = [
-        "Asia/Kolkata", "Asia/Calcutta",  # India
-        "Asia/Karachi",  # Pakistan
-        "Asia/Dhaka",  # Bangladesh
-        "Asia/Colombo",  # Sri Lanka
-        "Asia/Kathmandu",  # Nepal
-        "Asia/Thimphu",  # Bhutan
-        "Indian/Maldives",  # Maldives
-        "Asia/Kabul"  # Afghanistan
-    ]
-    
-    if timezone_str in south_asian_timezones:
-        return {
-            "currency": "INR",
-            "symbol": "₹",
-            "region": "South Asia",
-            "single": 9.99,
-            "bundle_3": 24.99,  # ₹8.33/link - Save 16%
-            "bundle_5": 34.99   # ₹7/link - Save 30%
-        }
-    else:
-        return {
-            "currency": "USD",
-            "symbol": "$",
-            "region": "International",
-            "single": 2.99,
-            "bundle_3": 7.49,   # $2.50/link - Save 16%
-            "bundle_5": 10.49   # $2.10/link - Save 30%
-        }
+    """Get pricing based on timezone (shared table entry; do not modify)"""
+    region = PRICING_REGION_BY_TIMEZONE.get(timezone_str, DEFAULT_PRICING_REGION)
+    return PRICING_REGIONS[region]
 
 # Helper function to get user from session token
+def cache_session(token: str, user_doc: Dict, expires_at: datetime):
+    """Cache a resolved session, never past its expiry"""
+    remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+    session_cache.set(token, (user_doc, expires_at), ttl=remaining)
+
 async def get_user_from_token(token: Optional[str]) -> Optional[Dict]:
     if not token:
         return None
     
-    session_doc = await db.user_sessions.find_one({"session_token": token}, {"_id": 0})
+    if SIGNED_SESSIONS and is_signed_token(token):
+        return await get_user_from_signed_token(token)
+    
+    cached = session_cache.get(token)
+    if cached:
+        user_doc, expires_at = cached
+        if expires_at < datetime.now(timezone.utc):
+            session_cache.pop(token)
+            return None
+        return dict(user_doc)
+    
+    user_doc = await session_loads.do(token, lambda: load_session(token))
+    return dict(user_doc) if user_doc else None
+
+async def load_session(token: str) -> Optional[Dict]:
+    """Resolve an opaque session token from the database and cache the user"""
+    # Signed sessions are kept as revocation records after logout; never accept those as opaque tokens
+    session_doc = await db.user_sessions.find_one(
+        {"session_token": token, "revoked_at": {"$exists": False}}, {"_id": 0}
+    )
     if not session_doc:
         return None
     
@@ -147,8 +348,52 @@ async def get_user_from_token(token: Optional[str]) -> Optional[Dict]:
         return None
     
     user_doc = await db.users.find_one({"user_id": session_doc["user_id"]}, {"_id": 0})
+    # A logout while we were reading detaches this load; don't cache its result
+    if user_doc and session_loads.is_leader(token):
+        cache_session(token, user_doc, expires_at)
+    return user_doc
+
+async def get_user_from_signed_token(token: str) -> Optional[Dict]:
+    """Verify a signed token in-process; only a user cache miss touches the database"""
+    claims = verify_session_token(SESSION_SECRET, token)
+    if claims is None or claims.session_id in revoked_sessions:
+        session_cache.pop(token)
+        return None
+    
+    cached = session_cache.get(token)
+    if cached:
+        return dict(cached[0])
+    
+    user_doc = await db.users.find_one({"user_id": claims.user_id}, {"_id": 0})
+    if user_doc:
+        cache_session(token, user_doc, claims.expires_at)
+        user_doc = dict(user_doc)
     return user_doc
 
+# Helpers for conditional (ETag / If-None-Match) responses
+TEMPLATES_CACHE_CONTROL = "public, max-age=3600"
+PRICING_CACHE_CONTROL = "public, max-age=3600"
+# Receivers must see new responses and payment status, so shared caches always revalidate
+VALENTINE_CACHE_CONTROL = "public, no-cache"
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def cached_json_response(request: Request, body: bytes, etag: str, cache_control: str) -> Response:
+    """Serve pre-rendered JSON, or 304 Not Modified when the client's copy is current"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Auth routes
 @api_router.post("/auth/session")
 async def create_session(request: Request, response: Response):
@@ -157,16 +402,19 @@ async def create_session(request: Request, response: Response):
     if not session_id:
         raise HTTPException(status_code=400, detail="X-Session-ID header required")
     
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id}
-        )
-        
-        if resp.status_code != 200:
-            raise HTTPException(status_code=401, detail="Invalid session")
-        
-        data = resp.json()
+    try:
+        with track_external("oauth"):
+            resp = await http_client.get(OAUTH_SESSION_URL, headers={"X-Session-ID": session_id})
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Authentication service timed out")
+    except httpx.HTTPError as e:
+        logger.error(f"OAuth session exchange failed: {e}")
+        raise HTTPException(status_code=502, detail="Authentication service unavailable")
+    
+    if resp.status_code != 200:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    
+    data = resp.json()
     
     user_id = f"user_{uuid.uuid4().hex[:12]}"
     existing_user = await db.users.find_one({"email": data["email"]}, {"_id": 0})
@@ -191,12 +439,17 @@ async def create_session(request: Request, response: Response):
         await db.users.insert_one(user_doc)
     
     session_token = data["session_token"]
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
     session_doc = {
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
+        "expires_at": expires_at,
         "created_at": datetime.now(timezone.utc)
     }
+    if SIGNED_SESSIONS:
+        session_doc["session_id"] = new_session_id()
+        session_token = sign_session_token(SESSION_SECRET, user_id, session_doc["session_id"], expires_at)
+        session_doc["session_token"] = session_token
     await db.user_sessions.insert_one(session_doc)
     
     response.set_cookie(
@@ -210,13 +463,15 @@ async def create_session(request: Request, response: Response):
     )
     
     user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+    if user_doc:
+        cache_session(session_token, user_doc, expires_at)
     
-    # Send welcome email to new users (don't await to avoid blocking)
+    # Queue welcome email to new users; delivery happens off the request path
     if not existing_user:
         try:
-            await send_welcome_email(data["email"], data["name"])
+            await email_outbox.enqueue("welcome", user_email=data["email"], user_name=data["name"])
         except Exception as e:
-            logger.error(f"Failed to send welcome email: {e}")
+            logger.error(f"Failed to queue welcome email: {e}")
     
     return user_doc
 
@@ -240,68 +495,70 @@ async def get_current_user(
 async def logout(response: Response, session_token: Optional[str] = Cookie(None)):
     """Logout user"""
     if session_token:
-        await db.user_sessions.delete_one({"session_token": session_token})
+        claims = verify_session_token(SESSION_SECRET, session_token) if SIGNED_SESSIONS else None
+        if claims:
+            # Signed tokens stay valid until expiry, so keep the session as a revocation record
+            await revoked_sessions.revoke(session_token, claims)
+        else:
+            await db.user_sessions.delete_one({"session_token": session_token})
+        # After the write, so later cache misses can't find the session; misses
+        # already in flight are detached by forget_session and won't cache it
+        invalidation_bus.publish("session", {"token": session_token})
     
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out"}
 
 # Template routes
-@api_router.get("/templates")
-async def get_templates():
+VALENTINE_TEMPLATES = [
+    {
+        "template_id": "runaway_no",
+        "name": "The Runaway No",
+        "description": "The No button runs away from the cursor!",
+        "interaction_type": "runaway"
+    },
+    {
+        "template_id": "emotional_damage",
+        "name": "Emotional Damage",
+        "description": "Sad messages and dimming screen when hovering No",
+        "interaction_type": "emotional"
+    },
+    {
+        "template_id": "guilt_trip",
+        "name": "Guilt Trip Deluxe",
+        "description": "Each No click makes Yes bigger and messages more dramatic",
+        "interaction_type": "guilt"
+    },
+    {
+        "template_id": "puppy_eyes",
+        "name": "Puppy Eyes Mode",
+        "description": "Cute puppy appears with big watery eyes",
+        "interaction_type": "puppy"
+    },
+    {
+        "template_id": "destiny_mode",
+        "name": "Destiny Mode",
+        "description": "Loading screen shows you're meant to say YES",
+        "interaction_type": "destiny"
+    }
+]
+TEMPLATES_BODY = orjson.dumps(VALENTINE_TEMPLATES)
+TEMPLATES_ETAG = make_etag(TEMPLATES_BODY)
+
+@api_router.get("/templates", response_model=List[ValentineTemplate])
+async def get_templates(request: Request):
     """Get all valentine templates"""
-    templates = [
-        {
-            "template_id": "runaway_no",
-            "name": "The Runaway No",
-            "description": "The No button runs away from the cursor!",
-            "interaction_type": "runaway"
-        },
-        {
-            "template_id": "emotional_damage",
-            "name": "Emotional Damage",
-            "description": "Sad messages and dimming screen when hovering No",
-            "interaction_type": "emotional"
-        },
-        {
-            "template_id": "guilt_trip",
-            "name": "Guilt Trip Deluxe",
-            "description": "Each No click makes Yes bigger and messages more dramatic",
-            "interaction_type": "guilt"
-        },
-        {
-            "template_id": "puppy_eyes",
-            "name": "Puppy Eyes Mode",
-            "description": "Cute puppy appears with big watery eyes",
-            "interaction_type": "puppy"
-        },
-        {
-            "template_id": "destiny_mode",
-            "name": "Destiny Mode",
-            "description": "Loading screen shows you're meant to say YES",
-            "interaction_type": "destiny"
-        }
-    ]
-    return templates
+    return cached_json_response(request, TEMPLATES_BODY, TEMPLATES_ETAG, TEMPLATES_CACHE_CONTROL)
 
 # Valentine routes
-@api_router.post("/valentines", response_model=Valentine)
-async def create_valentine(
-    valentine_data: ValentineCreate,
-    session_token: Optional[str] = Cookie(None),
-    authorization: Optional[str] = None
-):
-    """Create a new valentine (requires auth)"""
-    token = session_token or (authorization.replace("Bearer ", "") if authorization else None)
-    user = await get_user_from_token(token)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
+def build_valentine_doc(user: Dict, valentine_data: ValentineCreate) -> Dict:
+    """New valentine document owned by `user`"""
     valentine_id = f"val_{uuid.uuid4().hex[:12]}"
     unique_link = f"{valentine_id}"
     
-    valentine_doc = {
+    return {
         "valentine_id": valentine_id,
         "user_id": user["user_id"],
+        "creator_email": user.get("email"),
         "template_id": valentine_data.template_id,
         "from_name": valentine_data.from_name,
         "to_name": valentine_data.to_name,
@@ -315,38 +572,310 @@ async def create_valentine(
         "response_at": None,
         "created_at": datetime.now(timezone.utc)
     }
+
+def creation_stats(valentine_docs: List[Dict]) -> Dict[str, int]:
+    """Counter deltas for newly created valentines"""
+    changes = {"total": len(valentine_docs)}
+    for valentine_doc in valentine_docs:
+        for key in (
+            "by_response.pending",
+            f"by_template.{stats_key(valentine_doc['template_id'])}",
+            f"by_payment_status.{stats_key(valentine_doc['payment_status'])}"
+        ):
+            changes[key] = changes.get(key, 0) + 1
+    return changes
+
+@api_router.post("/valentines", response_model=Valentine)
+async def create_valentine(
+    valentine_data: ValentineCreate,
+    request: Request,
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = None
+):
+    """Create a new valentine (requires auth)"""
+    token = session_token or (authorization.replace("Bearer ", "") if authorization else None)
+    user = await get_user_from_token(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    async def create():
+        valentine_doc = build_valentine_doc(user, valentine_data)
+        await db.valentines.insert_one(valentine_doc)
+        valentine_doc.pop("_id", None)
+        await bump_user_stats(user["user_id"], creation_stats([valentine_doc]))
+        return valentine_doc
+    
+    return await idempotency.run(request, f"valentines:{user['user_id']}", create)
+
+@api_router.post("/valentines/batch", response_model=List[Valentine])
+async def create_valentine_batch(
+    batch_data: ValentineBatchCreate,
+    request: Request,
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = None
+):
+    """Create all valentines of a bundle in one request (requires auth)"""
+    token = session_token or (authorization.replace("Bearer ", "") if authorization else None)
+    user = await get_user_from_token(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    bundle_size = BUNDLE_SIZES.get(batch_data.bundle_type)
+    if bundle_size is None:
+        raise HTTPException(status_code=400, detail="Unknown bundle type")
+    if len(batch_data.valentines) != bundle_size:
+        raise HTTPException(status_code=400, detail=f"{batch_data.bundle_type} needs exactly {bundle_size} valentines")
     
-    await db.valentines.insert_one(valentine_doc)
-    valentine = await db.valentines.find_one({"valentine_id": valentine_id}, {"_id": 0})
+    async def create():
+        valentine_docs = [build_valentine_doc(user, valentine_data) for valentine_data in batch_data.valentines]
+        await db.valentines.insert_many(valentine_docs)
+        for valentine_doc in valentine_docs:
+            valentine_doc.pop("_id", None)
+        await bump_user_stats(user["user_id"], creation_stats(valentine_docs))
+        return valentine_docs
     
-    if valentine and isinstance(valentine['created_at'], str):
+    return await idempotency.run(request, f"valentines/batch:{user['user_id']}", create)
+
+def normalize_valentine_dates(valentine: Dict):
+    """Parse datetimes that legacy rows stored as ISO strings"""
+    if isinstance(valentine.get('created_at'), str):
         valentine['created_at'] = datetime.fromisoformat(valentine['created_at'])
+    if valentine.get('response_at') and isinstance(valentine['response_at'], str):
+        valentine['response_at'] = datetime.fromisoformat(valentine['response_at'])
+
+# Helpers for keyset pagination over (created_at, valentine_id)
+def encode_cursor(valentine: Dict) -> str:
+    """Encode the sort key of the last valentine on a page as an opaque cursor"""
+    created_at = valentine["created_at"]
+    if isinstance(created_at, datetime):
+        key = ["d", created_at.isoformat(), valentine["valentine_id"]]
+    else:
+        key = ["s", created_at, valentine["valentine_id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def cursor_filter(cursor: str) -> Dict:
+    """Build the query that resumes a newest-first listing after `cursor`"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        kind, created_at, valentine_id = json.loads(base64.urlsafe_b64decode(padded))
+        if kind == "d":
+            created_at = datetime.fromisoformat(created_at)
+        elif kind != "s":
+            raise ValueError(kind)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return valentine
+    clauses = [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "valentine_id": {"$lt": valentine_id}},
+    ]
+    # Legacy rows store created_at as an ISO string, which sorts below every date
+    if kind == "d" and not DATES_NORMALIZED:
+        clauses.append({"created_at": {"$type": "string"}})
+    return {"$or": clauses}
 
-@api_router.get("/valentines", response_model=List[Valentine])
+@api_router.get("/valentines", response_model=List[CreatorValentine])
 async def get_user_valentines(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = None
 ):
-    """Get all valentines created by the user"""
+    """Get valentines created by the user, newest first.
+    
+    Pages are linked through the X-Next-Cursor response header; `fields` is a
+    comma-separated list of columns to return.
+    """
     token = session_token or (authorization.replace("Bearer ", "") if authorization else None)
     user = await get_user_from_token(token)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    valentines = await db.valentines.find({"user_id": user["user_id"]}, {"_id": 0}).to_list(1000)
+    projection = CREATOR_VALENTINE_PROJECTION
+    if fields:
+        projection = {"_id": 0}
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = requested - set(CreatorValentine.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        # The sort key is always returned so the page can be resumed
+        for field in requested | {"valentine_id", "created_at"}:
+            projection[field] = 1
     
-    for valentine in valentines:
-        if isinstance(valentine['created_at'], str):
-            valentine['created_at'] = datetime.fromisoformat(valentine['created_at'])
-        if valentine.get('response_at') and isinstance(valentine['response_at'], str):
-            valentine['response_at'] = datetime.fromisoformat(valentine['response_at'])
+    query = {"user_id": user["user_id"]}
+    if cursor:
+        query.update(cursor_filter(cursor))
+    
+    valentines = await public_reads(db.valentines).find(query, projection).sort(
+        [("created_at", DESCENDING), ("valentine_id", DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    headers = {}
+    if len(valentines) > limit:
+        valentines = valentines[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(valentines[-1])
     
-    return valentines
+    if not DATES_NORMALIZED:
+        for valentine in valentines:
+            normalize_valentine_dates(valentine)
+    
+    if "view_count" in projection:
+        # Include opens buffered in this process but not flushed yet
+        for valentine in valentines:
+            valentine["view_count"] = valentine.get("view_count", 0) + valentine_views.pending(valentine["valentine_id"])
+    
+    # The projection already limits documents to CreatorValentine fields, so they are
+    # serialized directly; response_model only documents the schema
+    return ORJSONResponse(valentines, headers=headers)
+
+# Dashboard statistics
+def response_bucket(response: Optional[str]) -> str:
+    if not response:
+        return "pending"
+    return response if response in ("yes", "no") else "other"
+
+def stats_key(value: Optional[str]) -> str:
+    """Counter key safe to use inside a Mongo field path"""
+    return re.sub(r"[.$]", "_", value or "unknown")
 
-@api_router.get("/valentines/{valentine_id}")
-async def get_valentine_by_id(valentine_id: str):
+async def compute_user_stats(user_id: str) -> Dict:
+    """Totals by response, template and payment status from one $group"""
+    stats = {"total": 0, "by_response": {"yes": 0, "no": 0, "pending": 0}, "by_template": {}, "by_payment_status": {}}
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": {"response": "$response", "template_id": "$template_id", "payment_status": "$payment_status"},
+            "count": {"$sum": 1}
+        }}
+    ]
+    async for group in db.valentines.aggregate(pipeline):
+        key, count = group["_id"], group["count"]
+        stats["total"] += count
+        for field, value in (
+            ("by_response", response_bucket(key.get("response"))),
+            ("by_template", stats_key(key.get("template_id"))),
+            ("by_payment_status", stats_key(key.get("payment_status")))
+        ):
+            stats[field][value] = stats[field].get(value, 0) + count
+    return stats
+
+async def bump_user_stats(user_id: str, changes: Dict[str, int]):
+    """Apply counter deltas to a user's stored stats, if they have been materialized"""
+    if not STATS_COUNTERS or not changes:
+        return
+    try:
+        result = await db.user_stats.update_one({"user_id": user_id, "seed_id": {"$exists": False}}, {"$inc": changes})
+        if result.matched_count == 0:
+            # A seed in progress may have aggregated before this change; don't let it store its totals
+            await db.user_stats.update_one(
+                {"user_id": user_id, "seed_id": {"$exists": True}}, {"$set": {"stale": True}}
+            )
+    except PyMongoError as e:
+        # Drop the counters so the next read recomputes them
+        logger.error(f"Failed to update stats for {user_id}: {e}")
+        await db.user_stats.delete_one({"user_id": user_id})
+
+def transition(field: str, old: str, new: str) -> Dict[str, int]:
+    if old == new:
+        return {}
+    return {f"{field}.{old}": -1, f"{field}.{new}": 1}
+
+@api_router.get("/valentines/stats")
+async def get_valentine_stats(
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = None
+):
+    """Dashboard totals for the user's valentines"""
+    token = session_token or (authorization.replace("Bearer ", "") if authorization else None)
+    user = await get_user_from_token(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if not STATS_COUNTERS:
+        return await compute_user_stats(user["user_id"])
+    
+    stats = await db.user_stats.find_one({"user_id": user["user_id"]}, {"_id": 0, "user_id": 0})
+    if stats and "seed_id" not in stats:
+        return stats
+    if stats:
+        # Another request is seeding the counters
+        return await compute_user_stats(user["user_id"])
+    return await seed_user_stats(user["user_id"])
+
+async def seed_user_stats(user_id: str) -> Dict:
+    """Materialize a user's counters from an aggregation.
+
+    A placeholder is inserted before aggregating, so a bump that lands meanwhile
+    marks it stale instead of being lost, and the totals are then discarded for
+    the next read to recompute. Placeholders left by a crashed seed expire.
+    """
+    seed_id = uuid.uuid4().hex
+    try:
+        await db.user_stats.insert_one({
+            "user_id": user_id,
+            "seed_id": seed_id,
+            "seed_expires_at": datetime.now(timezone.utc) + timedelta(seconds=STATS_SEED_TIMEOUT)
+        })
+    except DuplicateKeyError:
+        return await compute_user_stats(user_id)
+    
+    stats = await compute_user_stats(user_id)
+    stored = await db.user_stats.update_one(
+        {"user_id": user_id, "seed_id": seed_id, "stale": {"$exists": False}},
+        {"$set": stats, "$unset": {"seed_id": "", "seed_expires_at": ""}}
+    )
+    if stored.matched_count == 0:
+        await db.user_stats.delete_one({"user_id": user_id, "seed_id": seed_id})
+    return stats
+
+@api_router.get("/valentines/events")
+async def stream_valentine_events(
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = None
+):
+    """Server-Sent Events with responses and payment updates for the user's valentines"""
+    token = session_token or (authorization.replace("Bearer ", "") if authorization else None)
+    user = await get_user_from_token(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if dashboard_events.subscriber_count(user["user_id"]) >= SSE_MAX_CONNECTIONS_PER_USER:
+        raise HTTPException(status_code=429, detail="Too many open event streams")
+    
+    return StreamingResponse(
+        sse_stream(dashboard_events, user["user_id"], SSE_KEEPALIVE),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def load_valentine(valentine_id: str) -> Optional[tuple]:
+    """Read a valentine from the database and cache its rendered JSON"""
+    # Only model fields are public, so e.g. the creator's email stays private
+    valentine = await public_reads(db.valentines).find_one({"valentine_id": valentine_id}, VALENTINE_PROJECTION)
+    if not valentine:
+        return None
+    
+    if not DATES_NORMALIZED:
+        normalize_valentine_dates(valentine)
+    
+    body = orjson.dumps(valentine)
+    rendered = (body, make_etag(body))
+    # An invalidation while we were reading detaches this load; don't cache its result
+    if valentine_loads.is_leader(valentine_id):
+        valentine_cache.set(valentine_id, rendered)
+    return rendered
+
+def invalidate_valentine(valentine_id: str):
+    """Drop a valentine from every worker's read cache after it changes"""
+    invalidation_bus.publish("valentine", {"valentine_id": valentine_id})
+
+def forget_valentine(valentine_id: str):
+    valentine_cache.pop(valentine_id)
+    valentine_loads.forget(valentine_id)
+
+@api_router.get("/valentines/{valentine_id}", response_model=Valentine)
+async def get_valentine_by_id(valentine_id: str, request: Request):
     """Get a specific valentine by ID (public route for receivers)"""
     # Handle demo valentine
     if valentine_id == "demo":
@@ -367,63 +896,87 @@ async def get_valentine_by_id(valentine_id: str):
             "created_at": datetime.now(timezone.utc)
         }
     
-    valentine = await db.valentines.find_one({"valentine_id": valentine_id}, {"_id": 0})
-    if not valentine:
+    rendered = valentine_cache.get(valentine_id)
+    if rendered is None:
+        rendered = await valentine_loads.do(valentine_id, lambda: load_valentine(valentine_id))
+    if rendered is None:
         raise HTTPException(status_code=404, detail="Valentine not found")
     
-    if isinstance(valentine['created_at'], str):
-        valentine['created_at'] = datetime.fromisoformat(valentine['created_at'])
-    if valentine.get('response_at') and isinstance(valentine['response_at'], str):
-        valentine['response_at'] = datetime.fromisoformat(valentine['response_at'])
-    
-    return valentine
+    valentine_views.incr(valentine_id)
+    body, etag = rendered
+    return cached_json_response(request, body, etag, VALENTINE_CACHE_CONTROL)
+
+async def get_creator_email(user_id: str) -> Optional[str]:
+    """Creator email for valentines created before it was stored on the document"""
+    email = creator_email_cache.get(user_id)
+    if email is None:
+        creator = await db.users.find_one({"user_id": user_id}, {"_id": 0, "email": 1})
+        email = creator.get("email") if creator else None
+        if email:
+            creator_email_cache.set(user_id, email)
+    return email
 
 @api_router.post("/valentines/{valentine_id}/response")
 async def record_valentine_response(valentine_id: str, response_data: ValentineResponse):
     """Record receiver's response to valentine"""
-    valentine = await db.valentines.find_one({"valentine_id": valentine_id}, {"_id": 0})
-    if not valentine:
-        raise HTTPException(status_code=404, detail="Valentine not found")
+    query = {"valentine_id": valentine_id}
+    if FIRST_RESPONSE_WINS:
+        query["response"] = None
     
-    await db.valentines.update_one(
-        {"valentine_id": valentine_id},
+    response_at = datetime.now(timezone.utc)
+    valentine = await db.valentines.find_one_and_update(
+        query,
         {"$set": {
             "response": response_data.response,
-            "response_at": datetime.now(timezone.utc)
-        }}
+            "response_at": response_at
+        }},
+        projection={"_id": 0, "user_id": 1, "from_name": 1, "to_name": 1, "creator_email": 1, "response": 1}
     )
+    if not valentine:
+        if FIRST_RESPONSE_WINS and await db.valentines.count_documents({"valentine_id": valentine_id}, limit=1):
+            raise HTTPException(status_code=409, detail="Response already recorded")
+        raise HTTPException(status_code=404, detail="Valentine not found")
+    invalidate_valentine(valentine_id)
+    await bump_user_stats(valentine["user_id"], transition(
+        "by_response", response_bucket(valentine.get("response")), response_bucket(response_data.response)
+    ))
+    publish_dashboard_event(valentine["user_id"], {
+        "type": "response",
+        "valentine_id": valentine_id,
+        "response": response_data.response,
+        "response_at": response_at.isoformat()
+    })
     
-    # Send email notification to creator
+    # Queue email notification to creator
     try:
-        # Get creator's email
-        creator = await db.users.find_one({"user_id": valentine["user_id"]}, {"_id": 0})
-        if creator and creator.get("email"):
-            await send_response_notification(
-                creator_email=creator["email"],
+        creator_email = valentine.get("creator_email") or await get_creator_email(valentine["user_id"])
+        if creator_email:
+            await email_outbox.enqueue(
+                "response",
+                creator_email=creator_email,
                 creator_name=valentine["from_name"],
                 to_name=valentine["to_name"],
                 response=response_data.response,
                 valentine_id=valentine_id
             )
     except Exception as e:
-        logger.error(f"Failed to send response notification email: {e}")
+        logger.error(f"Failed to queue response notification email: {e}")
     
     return {"message": "Response recorded"}
 
 # Payment routes
-@api_router.post("/payment/pricing")
-async def get_pricing(request: Request):
-    """Get regional pricing based on user's timezone"""
+async def read_timezone(request: Request) -> str:
+    """The client's timezone from a JSON body like {"timezone": "Asia/Kolkata"}"""
     try:
-        body = await request.json()
-        timezone = body.get("timezone", "UTC")
-    except:
-        timezone = "UTC"
-    
-    pricing = get_regional_pricing_by_timezone(timezone)
-    
-    return {
-        "timezone": timezone,
+        payload = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        return "UTC"
+    timezone = payload.get("timezone") if isinstance(payload, dict) else None
+    return timezone if isinstance(timezone, str) else "UTC"
+
+# Pricing bodies without the echoed timezone, rendered once per region
+PRICING_REGION_BODIES = {
+    region: orjson.dumps({
         "region": pricing["region"],
         "currency": pricing["currency"],
         "symbol": pricing["symbol"],
@@ -432,53 +985,78 @@ async def get_pricing(request: Request):
             "bundle_3": pricing["bundle_3"],
             "bundle_5": pricing["bundle_5"]
         }
-    }
+    })
+    for region, pricing in PRICING_REGIONS.items()
+}
+
+def render_pricing(timezone: str) -> tuple:
+    """Pricing response body and ETag for `timezone`"""
+    region = PRICING_REGION_BY_TIMEZONE.get(timezone, DEFAULT_PRICING_REGION)
+    body = b'{"timezone":' + orjson.dumps(timezone) + b"," + PRICING_REGION_BODIES[region][1:]
+    return body, make_etag(body)
+
+# Responses for every listed timezone and UTC, rendered at startup
+PRICING_RESPONSES = {
+    timezone: render_pricing(timezone)
+    for timezone in [*PRICING_REGION_BY_TIMEZONE, "UTC"]
+}
+
+@api_router.post("/payment/pricing")
+async def get_pricing(request: Request):
+    """Get regional pricing based on user's timezone"""
+    timezone = await read_timezone(request)
+    
+    # Unlisted zones are client-supplied strings; splicing them in is cheap, so they aren't cached
+    body, etag = PRICING_RESPONSES.get(timezone) or render_pricing(timezone)
+    return cached_json_response(request, body, etag, PRICING_CACHE_CONTROL)
 
 @api_router.post("/payment/create-order")
 async def create_payment_order(payment_data: PaymentCreate, request: Request):
     """Create Razorpay order with regional pricing"""
-    try:
-        # Get timezone from request body or headers
+    async def create_order():
         try:
-            body = await request.json()
-            timezone = body.get("timezone", "UTC")
-        except:
-            timezone = "UTC"
-        
-        pricing = get_regional_pricing_by_timezone(timezone)
-        
-        # Get price based on bundle type
-        price_map = {
-            "single": pricing["single"],
-            "bundle_3": pricing["bundle_3"],
-            "bundle_5": pricing["bundle_5"]
-        }
-        
-        amount = price_map.get(payment_data.bundle_type, pricing["single"])
-        currency = pricing["currency"]
-        
-        # Razorpay expects amount in smallest currency unit (paise for INR, cents for USD)
-        razorpay_amount = int(amount * 100)
-        
-        order_data = {
-            "amount": razorpay_amount,
-            "currency": currency,
-            "receipt": payment_data.valentine_id,
-            "notes": {
+            timezone = await read_timezone(request)
+            pricing = get_regional_pricing_by_timezone(timezone)
+            
+            # Get price based on bundle type
+            bundle_type = payment_data.bundle_type if payment_data.bundle_type in BUNDLE_SIZES else "single"
+            amount = pricing[bundle_type]
+            currency = pricing["currency"]
+            
+            # Razorpay expects amount in smallest currency unit (paise for INR, cents for USD)
+            razorpay_amount = int(amount * 100)
+            
+            order_data = {
+                "amount": razorpay_amount,
+                "currency": currency,
+                "receipt": payment_data.valentine_id,
+                "notes": {
+                    "bundle_type": payment_data.bundle_type,
+                    "timezone": timezone
+                }
+            }
+            with track_external("razorpay"):
+                order = await run_razorpay(razorpay_client.order.create, data=order_data)
+            return {
+                "order_id": order["id"],
+                "amount": order["amount"],
+                "currency": order["currency"],
                 "bundle_type": payment_data.bundle_type,
-                "timezone": timezone
+                "display_amount": amount
             }
-        }
-        order = razorpay_client.order.create(data=order_data)
-        return {
-            "order_id": order["id"],
-            "amount": order["amount"],
-            "currency": order["currency"],
-            "bundle_type": payment_data.bundle_type,
-            "display_amount": amount
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        except requests.exceptions.Timeout:
+            raise HTTPException(status_code=504, detail="Payment provider timed out")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await idempotency.run(request, f"payment/create-order:{payment_data.valentine_id}", create_order)
+
+def publish_payment_completed(user_id: str, valentine_id: str):
+    publish_dashboard_event(user_id, {
+        "type": "payment",
+        "valentine_id": valentine_id,
+        "payment_status": "completed"
+    })
 
 @api_router.post("/payment/verify")
 async def verify_payment(payment_data: PaymentVerify):
@@ -490,16 +1068,23 @@ async def verify_payment(payment_data: PaymentVerify):
             hashlib.sha256
         ).hexdigest()
         
-        if generated_signature != payment_data.razorpay_signature:
+        if not hmac.compare_digest(generated_signature.encode(), payment_data.razorpay_signature.encode()):
             raise HTTPException(status_code=400, detail="Invalid payment signature")
         
-        await db.valentines.update_one(
+        valentine = await db.valentines.find_one_and_update(
             {"valentine_id": payment_data.valentine_id},
             {"$set": {
                 "payment_status": "completed",
                 "payment_id": payment_data.razorpay_payment_id
-            }}
+            }},
+            projection={"_id": 0, "user_id": 1, "payment_status": 1}
         )
+        invalidate_valentine(payment_data.valentine_id)
+        if valentine:
+            await bump_user_stats(valentine["user_id"], transition(
+                "by_payment_status", stats_key(valentine.get("payment_status")), "completed"
+            ))
+            publish_payment_completed(valentine["user_id"], payment_data.valentine_id)
         
         return {"message": "Payment verified successfully"}
     except HTTPException:
@@ -507,6 +1092,63 @@ async def verify_payment(payment_data: PaymentVerify):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def on_payments_reconciled(valentines: List[Dict]):
+    """Refresh caches and counters for valentines completed by the reconciler"""
+    for valentine in valentines:
+        invalidate_valentine(valentine["valentine_id"])
+        publish_payment_completed(valentine["user_id"], valentine["valentine_id"])
+    if STATS_COUNTERS:
+        # Recomputed on the next dashboard read
+        await db.user_stats.delete_many({"user_id": {"$in": list({v["user_id"] for v in valentines})}})
+
+payment_reconciler = PaymentReconciler(db, on_applied=on_payments_reconciled)
+
+@api_router.post("/payment/razorpay-webhook")
+async def razorpay_webhook(request: Request):
+    """Queue signed Razorpay payment events for reconciliation"""
+    if not RAZORPAY_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook not configured")
+    
+    body = await request.body()
+    if not verify_webhook_signature(body, request.headers.get("x-razorpay-signature"), RAZORPAY_WEBHOOK_SECRET):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+    
+    try:
+        event = parse_payment_event(orjson.loads(body))
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    # Razorpay retries anything but a 2xx, so ignored and duplicate events are acknowledged too
+    if event is None:
+        return {"status": "ignored"}
+    queued = await payment_reconciler.enqueue(event)
+    return {"status": "queued" if queued else "duplicate"}
+
+# Cross-worker invalidation handlers
+def publish_dashboard_event(user_id: str, event: Dict):
+    """Push an event to the user's open dashboards, whichever worker holds them"""
+    invalidation_bus.publish("dashboard_event", {"user_id": user_id, "event": event})
+
+def forget_session(token: str):
+    session_cache.pop(token)
+    session_loads.forget(token)
+    claims = verify_session_token(SESSION_SECRET, token) if SIGNED_SESSIONS else None
+    if claims:
+        revoked_sessions.mark(claims)
+
+def drop_local_state(payload: Dict):
+    """Messages were missed, so nothing cached here can be trusted"""
+    valentine_cache.clear()
+    valentine_loads.clear()
+    session_cache.clear()
+    session_loads.clear()
+    dashboard_events.broadcast(RESET_EVENT)
+
+invalidation_bus.on("valentine", lambda payload: forget_valentine(payload["valentine_id"]))
+invalidation_bus.on("session", lambda payload: forget_session(payload["token"]))
+invalidation_bus.on("dashboard_event", lambda payload: dashboard_events.publish(payload["user_id"], payload["event"]))
+invalidation_bus.on(GAP, drop_local_state)
+
 # Include router
 app.include_router(api_router)
 
@@ -516,7 +1158,20 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+
+# Prometheus scrape endpoint; set METRICS_TOKEN to require a bearer token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -524,6 +1179,166 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Indexes backing every query the API issues
+INDEXES = {
+    "users": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+        ([("email", ASCENDING)], {"unique": True}),
+    ],
+    "user_sessions": [
+        ([("session_token", ASCENDING)], {"unique": True}),
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+        ([("revoked_at", ASCENDING)], {"sparse": True}),
+    ],
+    "valentines": [
+        ([("valentine_id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("valentine_id", DESCENDING)], {}),
+    ],
+    "user_stats": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+        ([("seed_expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "idempotency_keys": [
+        ([("key", ASCENDING)], {"unique": True}),
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "payment_events": [
+        ([("payment_id", ASCENDING)], {"unique": True}),
+        ([("status", ASCENDING), ("received_at", ASCENDING)], {}),
+        ([("processed_at", ASCENDING)], {"expireAfterSeconds": 30 * 24 * 60 * 60}),
+    ],
+    "email_outbox": [
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+        ([("sent_at", ASCENDING)], {"expireAfterSeconds": 7 * 24 * 60 * 60}),
+    ],
+}
+
+# Query shapes checked with explain() at startup: (collection, filter, sort)
+QUERY_SHAPES = [
+    ("users", {"user_id": ""}, None),
+    ("users", {"email": ""}, None),
+    ("user_sessions", {"session_token": ""}, None),
+    ("user_sessions", {"revoked_at": {"$exists": True}}, None),
+    ("valentines", {"valentine_id": ""}, None),
+    ("valentines", {"user_id": ""}, [("created_at", DESCENDING), ("valentine_id", DESCENDING)]),
+    ("idempotency_keys", {"key": ""}, None),
+    ("payment_events", {"status": "pending"}, [("received_at", ASCENDING)]),
+]
+
+def plan_stages(plan: Dict) -> List[str]:
+    """Flatten the stage names of an explain() winning plan"""
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+async def ensure_indexes():
+    """Create indexes and report any query shape still planning as COLLSCAN"""
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except PyMongoError as e:
+                logger.error(f"Failed to create index {keys} on {collection}: {e}")
+    
+    collscans = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.explain()
+        except PyMongoError as e:
+            logger.warning(f"Could not explain {collection} {query}: {e}")
+            continue
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in plan_stages(winning_plan):
+            collscans.append(f"{collection} {list(query)}")
+    
+    if collscans:
+        logger.warning(f"Query shapes still planning as COLLSCAN: {', '.join(collscans)}")
+    else:
+        logger.info("Index check passed: no query shape plans as COLLSCAN")
+
+async def warm_up_mongo():
+    """Open pooled connections before traffic arrives with concurrent pings"""
+    try:
+        await asyncio.gather(*(client.admin.command("ping") for _ in range(MONGO_WARMUP_CONNECTIONS)))
+    except PyMongoError as e:
+        logger.warning(f"MongoDB warm-up ping failed: {e}")
+
+@app.on_event("startup")
+async def startup_db_client():
+    global DATES_NORMALIZED
+    await warm_up_mongo()
+    await ensure_indexes()
+    try:
+        DATES_NORMALIZED = await migrate_dates.is_complete(db)
+    except PyMongoError as e:
+        logger.warning(f"Could not read migration state: {e}")
+    if not DATES_NORMALIZED:
+        logger.info("Legacy string dates are converted on read until migrate_dates.py completes")
+
+@app.on_event("startup")
+async def startup_http_client():
+    global http_client
+    http_client = create_http_client()
+
+@app.on_event("startup")
+async def startup_email_outbox():
+    email_outbox.start()
+
+@app.on_event("startup")
+async def startup_invalidation_bus():
+    await invalidation_bus.start()
+
+@app.on_event("startup")
+async def startup_revoked_sessions():
+    if SIGNED_SESSIONS:
+        await revoked_sessions.start()
+
+@app.on_event("startup")
+async def startup_payment_reconciler():
+    payment_reconciler.start()
+
+@app.on_event("startup")
+async def startup_valentine_views():
+    valentine_views.start()
+
+@app.on_event("shutdown")
+async def shutdown_email_outbox():
+    await email_outbox.stop()
+    await close_smtp_pool()
+
+@app.on_event("shutdown")
+async def shutdown_invalidation_bus():
+    await invalidation_bus.stop()
+
+@app.on_event("shutdown")
+async def shutdown_revoked_sessions():
+    await revoked_sessions.stop()
+
+@app.on_event("shutdown")
+async def shutdown_payment_reconciler():
+    await payment_reconciler.stop()
+
+@app.on_event("shutdown")
+async def shutdown_valentine_views():
+    # Runs before shutdown_db_client so the last buffered views are written
+    await valentine_views.stop()
+
+@app.on_event("shutdown")
+async def shutdown_razorpay_executor():
+    razorpay_executor.shutdown(wait=False)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    if http_client:
+        await http_client.aclose()
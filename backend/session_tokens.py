@@ -0,0 +1,136 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Set
+
+import orjson
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Signed tokens look like "st1.<base64url payload>.<base64url HMAC-SHA256>"
+TOKEN_PREFIX = "st1."
+
+
+class SessionClaims(NamedTuple):
+    user_id: str
+    session_id: str
+    expires_at: datetime
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(secret: bytes, payload: str) -> bytes:
+    digest = hmac.new(secret, payload.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest).encode("ascii")
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(12)
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(TOKEN_PREFIX)
+
+
+def sign_session_token(secret: bytes, user_id: str, session_id: str, expires_at: datetime) -> str:
+    """Issue a token carrying the user, session id and expiry"""
+    payload = _b64encode(orjson.dumps([user_id, session_id, int(expires_at.timestamp())]))
+    return f"{TOKEN_PREFIX}{payload}.{_signature(secret, payload).decode('ascii')}"
+
+
+def verify_session_token(secret: bytes, token: str) -> Optional[SessionClaims]:
+    """Claims of a correctly signed, unexpired token; None otherwise"""
+    if not is_signed_token(token):
+        return None
+    payload, _, signature = token[len(TOKEN_PREFIX):].partition(".")
+    try:
+        if not hmac.compare_digest(signature.encode("ascii"), _signature(secret, payload)):
+            return None
+        user_id, session_id, expires = orjson.loads(_b64decode(payload))
+        expires_at = datetime.fromtimestamp(expires, timezone.utc)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if not isinstance(user_id, str) or not isinstance(session_id, str):
+        return None
+    if expires_at <= datetime.now(timezone.utc):
+        return None
+    return SessionClaims(user_id, session_id, expires_at)
+
+
+class RevocationList:
+    """Deny-set of logged-out signed sessions, refreshed from user_sessions.
+
+    Logout marks the session document with revoked_at; the TTL index on
+    expires_at drops it once the token would have expired anyway, so the
+    set only ever holds revoked sessions that are still otherwise valid.
+    """
+
+    def __init__(self, db, refresh_interval=None):
+        self.collection = db.user_sessions
+        self.refresh_interval = refresh_interval or float(os.environ.get("SESSION_REVOCATION_REFRESH", "30"))
+        self._revoked: Set[str] = set()
+        # Revocations made by this process, kept until expiry so a refresh
+        # that raced the write can't drop them: session_id -> expires_at
+        self._local: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def mark(self, claims: SessionClaims):
+        """Deny a session in this process without waiting for the next refresh"""
+        self._local[claims.session_id] = claims.expires_at
+        self._revoked.add(claims.session_id)
+
+    async def revoke(self, token: str, claims: SessionClaims):
+        self.mark(claims)
+        await self.collection.update_one(
+            {"session_token": token},
+            {"$set": {"revoked_at": datetime.now(timezone.utc)}}
+        )
+
+    async def refresh(self):
+        revoked = set()
+        async for doc in self.collection.find({"revoked_at": {"$exists": True}}, {"_id": 0, "session_id": 1}):
+            if "session_id" in doc:
+                revoked.add(doc["session_id"])
+        now = datetime.now(timezone.utc)
+        self._local = {sid: expires_at for sid, expires_at in self._local.items() if expires_at > now}
+        self._revoked = revoked | self._local.keys()
+
+    async def start(self):
+        """Load the deny-set, then keep refreshing it in the background"""
+        try:
+            await self.refresh()
+        except PyMongoError as e:
+            logger.error(f"Failed to load revoked sessions: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except PyMongoError as e:
+                logger.error(f"Failed to refresh revoked sessions: {e}")
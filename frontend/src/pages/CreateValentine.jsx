@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Heart, ArrowLeft } from 'lucide-react';
 import { Button } from '../components/ui/button';
@@ -22,6 +22,8 @@ const CreateValentine = () => {
     background_theme: 'pink'
   });
   const [loading, setLoading] = useState(false);
+  // Retries of the same form reuse one key so the server never creates a duplicate
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [formData, selectedTemplate]);
   
   useEffect(() => {
     fetchTemplates();
@@ -57,7 +59,7 @@ const CreateValentine = () => {
           ...formData,
           template_id: selectedTemplate
         },
-        { withCredentials: true }
+        { withCredentials: true, headers: { 'Idempotency-Key': idempotencyKey } }
       );
       
       toast.success('Valentine created! 🎉');
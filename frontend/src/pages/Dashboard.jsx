@@ -6,16 +6,45 @@ import axios from 'axios';
 import { toast } from 'sonner';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const VALENTINE_FIELDS = 'valentine_id,to_name,from_name,message,template_id,payment_status,response,view_count';
 
 const Dashboard = () => {
   const navigate = useNavigate();
   const [valentines, setValentines] = useState([]);
   const [loading, setLoading] = useState(true);
   const [user, setUser] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState(null);
   
   useEffect(() => {
     fetchUser();
     fetchValentines();
+    fetchStats();
+  }, []);
+  
+  // Live response and payment updates instead of refreshing the whole list
+  useEffect(() => {
+    const events = new EventSource(`${BACKEND_URL}/api/valentines/events`, { withCredentials: true });
+    const updateValentine = (valentineId, changes) => {
+      setValentines((prev) => prev.map((v) => (v.valentine_id === valentineId ? { ...v, ...changes } : v)));
+    };
+    events.addEventListener('response', (e) => {
+      const data = JSON.parse(e.data);
+      updateValentine(data.valentine_id, { response: data.response });
+      fetchStats();
+      if (data.response === 'yes') toast.success('Someone just said Yes! 🎉');
+    });
+    events.addEventListener('payment', (e) => {
+      const data = JSON.parse(e.data);
+      updateValentine(data.valentine_id, { payment_status: data.payment_status });
+      fetchStats();
+    });
+    events.addEventListener('reset', () => {
+      fetchValentines();
+      fetchStats();
+    });
+    return () => events.close();
   }, []);
   
   const fetchUser = async () => {
@@ -29,12 +58,16 @@ const Dashboard = () => {
     }
   };
   
-  const fetchValentines = async () => {
+  const fetchValentines = async (cursor = null) => {
     try {
+      const params = { fields: VALENTINE_FIELDS };
+      if (cursor) params.cursor = cursor;
       const response = await axios.get(`${BACKEND_URL}/api/valentines`, {
+        params,
         withCredentials: true
       });
-      setValentines(response.data);
+      setValentines((prev) => (cursor ? [...prev, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching valentines:', error);
     } finally {
@@ -42,6 +75,23 @@ const Dashboard = () => {
     }
   };
   
+  const fetchStats = async () => {
+    try {
+      const response = await axios.get(`${BACKEND_URL}/api/valentines/stats`, {
+        withCredentials: true
+      });
+      setStats(response.data);
+    } catch (error) {
+      console.error('Error fetching stats:', error);
+    }
+  };
+  
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchValentines(nextCursor);
+    setLoadingMore(false);
+  };
+  
   const handleLogout = async () => {
     try {
       await axios.post(`${BACKEND_URL}/api/auth/logout`, {}, {
@@ -89,6 +139,13 @@ const Dashboard = () => {
                 Your <span className="text-primary">Valentines</span> 💕
               </h1>
               <p className="text-sm sm:text-base md:text-lg text-foreground/70 font-body">Create and manage your love pranks!</p>
+              {stats && stats.total > 0 && (
+                <div data-testid="valentine-stats" className="flex flex-wrap gap-2 mt-3">
+                  <span className="px-3 py-1 rounded-full bg-pink-100 text-sm font-heading font-bold">{stats.total} sent 💌</span>
+                  <span className="px-3 py-1 rounded-full bg-green-100 text-sm font-heading font-bold">{stats.by_response.yes} said yes 🎉</span>
+                  <span className="px-3 py-1 rounded-full bg-yellow-100 text-sm font-heading font-bold">{stats.by_response.pending} waiting 🤔</span>
+                </div>
+              )}
             </div>
             <Link to="/create" className="w-full sm:w-auto">
               <Button data-testid="create-new-btn" size="lg" className="w-full sm:w-auto cartoon-border rounded-full px-6 sm:px-8 py-5 sm:py-6 text-lg sm:text-xl font-heading font-bold bg-primary hover:bg-primary/90 shadow-floating animate-pulse hover:scale-110 transition-all text-white">
@@ -159,6 +216,11 @@ const Dashboard = () => {
                         {valentine.response === 'yes' ? 'They said Yes! 🎉' : 'Waiting... 🤔'}
                       </span>
                     )}
+                    {valentine.view_count > 0 && (
+                      <span data-testid={`views-${valentine.valentine_id}`} className="px-3 py-1 bg-secondary text-foreground/70 text-xs font-body font-bold rounded-full border-2 border-foreground/10">
+                        👀 {valentine.view_count} {valentine.view_count === 1 ? 'view' : 'views'}
+                      </span>
+                    )}
                   </div>
                   
                   {valentine.payment_status === 'completed' ? (
@@ -202,6 +264,19 @@ const Dashboard = () => {
               ))}
             </div>
           )}
+          
+          {nextCursor && (
+            <div className="text-center mt-10">
+              <Button
+                data-testid="load-more-btn"
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="cartoon-border rounded-full px-8 py-4 font-heading font-bold bg-white hover:bg-gray-50 text-foreground"
+              >
+                {loadingMore ? 'Loading...' : 'Load More 💌'}
+              </Button>
+            </div>
+          )}
         </main>
       </div>
     </div>
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Heart, CreditCard, Zap } from 'lucide-react';
 import { Button } from '../components/ui/button';
@@ -24,6 +24,8 @@ const PaymentPage = () => {
       bundle_5: { price: 34.99, name: '5 Links Bundle', links: 5, savings: 30 }
     }
   });
+  // Retrying checkout for the same bundle reuses the Razorpay order instead of creating another
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [valentineId, selectedBundle, pricing]);
   
   useEffect(() => {
     fetchPricing();
@@ -96,7 +98,7 @@ const PaymentPage = () => {
           bundle_type: selectedBundle,
           timezone: pricing.timezone
         },
-        { withCredentials: true }
+        { withCredentials: true, headers: { 'Idempotency-Key': idempotencyKey } }
       );
       
       const options = {
@@ -106,6 +108,9 @@ const PaymentPage = () => {
         order_id: orderResponse.data.order_id,
         name: "Cupid's Prank",
         description: pricing.bundles[selectedBundle].name,
+        notes: {
+          valentine_id: valentineId
+        },
         handler: async function (response) {
           try {
             await axios.post(
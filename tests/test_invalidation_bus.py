@@ -0,0 +1,203 @@
+"""Cache invalidation across worker processes.
+
+Starts API workers through run.py against a real MongoDB, warms each
+worker's caches, then checks that a write on one worker is visible on the
+others well before their cache TTLs expire. Those tests are skipped when
+MongoDB is not reachable at MONGO_URL.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import run
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+WORKERS = 3
+# Much shorter than the cache TTLs below, so only the bus can explain a refresh
+PROPAGATION_TIMEOUT = 3.0
+
+
+def mongo_available() -> bool:
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+requires_mongo = pytest.mark.skipif(not mongo_available(), reason="MongoDB is not reachable")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(check, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.05)
+    return check()
+
+
+@pytest.fixture(scope="module")
+def seeded_db():
+    db_name = f"test_bus_{uuid.uuid4().hex[:8]}"
+    client = MongoClient(MONGO_URL)
+    db = client[db_name]
+    now = datetime.now(timezone.utc)
+    db.users.insert_one({"user_id": "user_bus", "email": "bus@example.com", "name": "Bus", "created_at": now})
+    db.user_sessions.insert_one({
+        "user_id": "user_bus",
+        "session_token": "token_bus",
+        "expires_at": now + timedelta(days=1),
+        "created_at": now
+    })
+    db.valentines.insert_one({
+        "valentine_id": "val_bus",
+        "user_id": "user_bus",
+        "template_id": "runaway_no",
+        "from_name": "A",
+        "to_name": "B",
+        "message": "Will you?",
+        "emoji_style": "cute",
+        "background_theme": "pink",
+        "unique_link": "val_bus",
+        "payment_status": "completed",
+        "response": None,
+        "response_at": None,
+        "created_at": now
+    })
+    yield db_name
+    client.drop_database(db_name)
+    client.close()
+
+
+def start_server(db_name, port, workers=1, **env):
+    env = dict(os.environ, MONGO_URL=MONGO_URL, DB_NAME=db_name, VALENTINE_CACHE_TTL="300",
+               SESSION_CACHE_TTL="300", **env)
+    return subprocess.Popen(
+        [sys.executable, "run.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def ready(url):
+    try:
+        return httpx.get(f"{url}/templates", timeout=1).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=10)
+
+
+@pytest.fixture(scope="module")
+def workers(seeded_db):
+    """Single-worker servers on separate ports, so each one can be addressed"""
+    ports = [free_port() for _ in range(WORKERS)]
+    processes = [start_server(seeded_db, port, INVALIDATION_BUS="mongo") for port in ports]
+    urls = [f"http://127.0.0.1:{port}/api" for port in ports]
+    try:
+        for url in urls:
+            assert wait_until(lambda: ready(url), 20), f"worker at {url} did not start"
+        yield urls
+    finally:
+        stop_servers(processes)
+
+
+def test_run_defaults_to_mongo_bus_with_several_workers(monkeypatch):
+    calls = []
+    monkeypatch.setattr(run.uvicorn, "run", lambda app, **options: calls.append((app, options)))
+
+    # Set before deleting so monkeypatch restores the original environment afterwards
+    monkeypatch.setenv("INVALIDATION_BUS", "")
+    monkeypatch.delenv("INVALIDATION_BUS")
+    run.main(["--workers", "1"])
+    assert "INVALIDATION_BUS" not in os.environ
+
+    run.main(["--workers", "3", "--port", "9000"])
+    assert os.environ["INVALIDATION_BUS"] == "mongo"
+    assert calls[-1] == ("server:app", {"host": "0.0.0.0", "port": 9000, "workers": 3, "proxy_headers": True})
+
+    monkeypatch.setenv("INVALIDATION_BUS", "local")
+    run.main(["--workers", "3"])
+    assert os.environ["INVALIDATION_BUS"] == "local"
+
+
+@requires_mongo
+def test_response_reaches_every_worker(workers):
+    # Warm every worker's valentine cache
+    for url in workers:
+        assert httpx.get(f"{url}/valentines/val_bus").json()["response"] is None
+
+    recorded = httpx.post(f"{workers[0]}/valentines/val_bus/response", json={"response": "yes"})
+    assert recorded.status_code == 200
+
+    for url in workers:
+        assert wait_until(
+            lambda: httpx.get(f"{url}/valentines/val_bus").json()["response"] == "yes", PROPAGATION_TIMEOUT
+        ), f"{url} still serves the cached valentine"
+
+
+@requires_mongo
+def test_logout_reaches_every_worker(workers):
+    cookies = {"session_token": "token_bus"}
+    # Warm every worker's session cache
+    for url in workers:
+        assert httpx.get(f"{url}/auth/me", cookies=cookies).status_code == 200
+
+    assert httpx.post(f"{workers[0]}/auth/logout", cookies=cookies).status_code == 200
+
+    for url in workers:
+        assert wait_until(
+            lambda: httpx.get(f"{url}/auth/me", cookies=cookies).status_code == 401, PROPAGATION_TIMEOUT
+        ), f"{url} still accepts the logged-out session"
+
+
+@requires_mongo
+def test_multi_worker_run_shares_invalidations(seeded_db, monkeypatch):
+    # No INVALIDATION_BUS: run.py must pick the Mongo bus itself for several workers
+    monkeypatch.delenv("INVALIDATION_BUS", raising=False)
+    port = free_port()
+    process = start_server(seeded_db, port, workers=2)
+    url = f"http://127.0.0.1:{port}/api"
+    try:
+        assert wait_until(lambda: ready(url), 20), "server did not start"
+        client = MongoClient(MONGO_URL)
+        client[seeded_db].valentines.insert_one({
+            **client[seeded_db].valentines.find_one({"valentine_id": "val_bus"}, {"_id": 0}),
+            "valentine_id": "val_multi", "unique_link": "val_multi", "response": None, "response_at": None
+        })
+        client.close()
+
+        # New connections are spread across the workers, so this warms both caches
+        for _ in range(40):
+            assert httpx.get(f"{url}/valentines/val_multi").json()["response"] is None
+
+        assert httpx.post(f"{url}/valentines/val_multi/response", json={"response": "yes"}).status_code == 200
+
+        def every_worker_updated():
+            return all(httpx.get(f"{url}/valentines/val_multi").json()["response"] == "yes" for _ in range(20))
+
+        assert wait_until(every_worker_updated, PROPAGATION_TIMEOUT), "a worker still serves the cached valentine"
+    finally:
+        stop_servers([process])
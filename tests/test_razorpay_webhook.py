@@ -0,0 +1,90 @@
+"""Razorpay webhook ingestion and reconciliation from recorded fixtures, with no network access."""
+import asyncio
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import server
+
+FIXTURES = Path(__file__).resolve().parent.parent / "backend" / "fixtures" / "razorpay_webhooks"
+WEBHOOK_SECRET = "whsec_test"
+# Valentines referenced by the paid fixtures, and by the failed one
+PAID = {"order_paid": "val_3f9c2a1b7d4e", "payment_captured": "val_8b1e6d0c2f7a"}
+FAILED = "val_5a7d9e3c1b2f"
+
+
+def sign(body: bytes) -> str:
+    return hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def fixture(name: str) -> bytes:
+    return (FIXTURES / f"{name}.json").read_bytes()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["webhook_test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "RAZORPAY_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(server.payment_reconciler, "db", db)
+    monkeypatch.setattr(server.payment_reconciler, "collection", db.payment_events)
+    return db
+
+
+async def post_webhook(body: bytes, signature: str) -> httpx.Response:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(
+            "/api/payment/razorpay-webhook", content=body, headers={"X-Razorpay-Signature": signature}
+        )
+
+
+def test_webhooks_are_queued_and_reconciled(db):
+    async def run():
+        await db.payment_events.create_index("payment_id", unique=True)
+        now = datetime.now(timezone.utc)
+        for valentine_id in [*PAID.values(), FAILED]:
+            await db.valentines.insert_one({
+                "valentine_id": valentine_id, "user_id": "user_1", "payment_status": "pending", "created_at": now
+            })
+
+        for name in PAID:
+            response = await post_webhook(fixture(name), sign(fixture(name)))
+            assert (response.status_code, response.json()) == (200, {"status": "queued"})
+        response = await post_webhook(fixture("payment_failed"), sign(fixture("payment_failed")))
+        assert (response.status_code, response.json()) == (200, {"status": "ignored"})
+
+        # Razorpay redelivers until it sees a 2xx
+        response = await post_webhook(fixture("order_paid"), sign(fixture("order_paid")))
+        assert (response.status_code, response.json()) == (200, {"status": "duplicate"})
+
+        assert await server.payment_reconciler.reconcile_batch() == 2
+        assert await server.payment_reconciler.reconcile_batch() == 0
+
+        for valentine_id in PAID.values():
+            valentine = await db.valentines.find_one({"valentine_id": valentine_id})
+            assert valentine["payment_status"] == "completed"
+            assert valentine["payment_id"].startswith("pay_")
+        assert (await db.valentines.find_one({"valentine_id": FAILED}))["payment_status"] == "pending"
+
+        events = await db.payment_events.find({}, {"_id": 0}).to_list(None)
+        assert sorted(event["valentine_id"] for event in events) == sorted(PAID.values())
+        assert {event["status"] for event in events} == {"applied"}
+
+    asyncio.run(run())
+
+
+def test_bad_signature_is_rejected(db):
+    async def run():
+        body = fixture("order_paid")
+        response = await post_webhook(body, sign(b"something else"))
+        assert response.status_code == 400
+        assert await db.payment_events.count_documents({}) == 0
+
+    asyncio.run(run())
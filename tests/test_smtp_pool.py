@@ -0,0 +1,131 @@
+"""SMTPPool against a local aiosmtpd server, with no network access."""
+import asyncio
+import socket
+from email.message import EmailMessage
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+import email_service
+from email_service import SMTPPool
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.peers = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content.decode())
+        self.peers.append(session.peer)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+def make_message(n: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "Cupid's Prank <hello@example.com>"
+    message["To"] = f"user{n}@example.com"
+    message["Subject"] = f"Message {n}"
+    message.set_content("Hello")
+    return message
+
+
+def make_pool(controller, **options) -> SMTPPool:
+    return SMTPPool(controller.hostname, controller.port, start_tls=False, **options)
+
+
+def test_reuses_connections(smtp_server):
+    async def run():
+        pool = make_pool(smtp_server, size=1)
+        for n in range(5):
+            await pool.send_message(make_message(n))
+        await pool.close()
+
+    asyncio.run(run())
+    handler = smtp_server.handler
+    assert len(handler.messages) == 5
+    assert len(set(handler.peers)) == 1
+
+
+def test_retires_connections_after_max_messages(smtp_server):
+    async def run():
+        pool = make_pool(smtp_server, size=1, max_messages=2)
+        for n in range(5):
+            await pool.send_message(make_message(n))
+        await pool.close()
+
+    asyncio.run(run())
+    assert len(set(smtp_server.handler.peers)) == 3
+
+
+def test_reconnects_after_server_restart():
+    handler = RecordingHandler()
+    port = free_port()
+    first = Controller(handler, hostname="127.0.0.1", port=port)
+    first.start()
+
+    async def run():
+        pool = make_pool(first, size=1)
+        await pool.send_message(make_message(0))
+        first.stop()
+        second = Controller(handler, hostname="127.0.0.1", port=port)
+        second.start()
+        try:
+            await pool.send_message(make_message(1))
+            await pool.close()
+        finally:
+            second.stop()
+
+    asyncio.run(run())
+    assert len(handler.messages) == 2
+    assert len(set(handler.peers)) == 2
+
+
+def test_send_email_without_auth(smtp_server, monkeypatch):
+    # The shared pool skips AUTH when SMTP_USERNAME is empty, as aiosmtpd has no AUTH extension
+    monkeypatch.setenv("SMTP_HOST", smtp_server.hostname)
+    monkeypatch.setenv("SMTP_PORT", str(smtp_server.port))
+    monkeypatch.setenv("SMTP_START_TLS", "false")
+    monkeypatch.setenv("SMTP_USERNAME", "")
+    monkeypatch.setattr(email_service, "smtp_pool", None)
+
+    async def run():
+        try:
+            return await email_service.send_email("user@example.com", "Hi", "<p>Hi</p>", "Hi")
+        finally:
+            await email_service.close_smtp_pool()
+
+    assert asyncio.run(run())
+    assert f"From: Cupid's Prank <{email_service.get_sender_address()}>" in smtp_server.handler.messages[0]
+
+
+def test_pool_reads_settings_loaded_after_import(monkeypatch):
+    # server.py loads backend/.env only after importing email_service
+    monkeypatch.setenv("SMTP_HOST", "smtp.example.com")
+    monkeypatch.setenv("SMTP_PORT", "2525")
+    monkeypatch.setenv("TECHXAK_EMAIL", "sender@example.com")
+    monkeypatch.setenv("TECHXAK_EMAIL_PASSWORD", "secret")
+    monkeypatch.delenv("SMTP_USERNAME", raising=False)
+    monkeypatch.setattr(email_service, "smtp_pool", None)
+
+    pool = email_service.get_smtp_pool()
+    assert (pool.hostname, pool.port, pool.username, pool.password) == (
+        "smtp.example.com", 2525, "sender@example.com", "secret"
+    )